@@ -0,0 +1,39 @@
+"""
+Offline configuration for the benchmarks. Imported before anything from
+``src`` so that settings resolve to throwaway local storage and no request
+ever leaves the machine.
+"""
+
+import os
+import tempfile
+from pathlib import Path
+
+# Prefer a RAM-backed directory so disk speed does not dominate the results.
+# Worker processes inherit the directory instead of creating their own.
+_root = "/dev/shm" if Path("/dev/shm").is_dir() else None
+WORK_DIR = Path(
+    os.environ.get("PDFCHAT_BENCH_DIR")
+    or tempfile.mkdtemp(prefix="pdfchat-bench-", dir=_root)
+)
+
+BENCHMARK_ENV = {
+    "PDFCHAT_BENCH_DIR": str(WORK_DIR),
+    "SQLALCHEMY_DATABASE_URI": f"sqlite+aiosqlite:///{WORK_DIR / 'bench.db'}",
+    "OPENAI_API_KEY": "sk-benchmark",
+    "REDIS_URI": "redis://localhost:6379/0",
+    "JWT_SECRET_KEY": "benchmark",
+    "JWT_ALGORITHM": "HS256",
+    "VECTOR_STORE_BACKEND": "local",
+    "LOCAL_VECTOR_STORE_PATH": str(WORK_DIR / "vectors"),
+    "LEXICAL_INDEX_PATH": str(WORK_DIR / "lexical"),
+    "EMBEDDING_CACHE_PATH": str(WORK_DIR / "embedding_cache.sqlite3"),
+    # Measure the work itself, not cache hits from the previous repetition.
+    "EMBEDDING_CACHE_ENABLED": "false",
+    "FILE_CHUNK_CACHE_MAX_CHARS": "0",
+    "ANSWER_CACHE_ENABLED": "false",
+    "EMBEDDING_REQUESTS_PER_MINUTE": "100000000",
+    "EMBEDDING_TOKENS_PER_MINUTE": "100000000000",
+}
+
+# Benchmarks always run offline, whatever the shell or .env says.
+os.environ.update(BENCHMARK_ENV)
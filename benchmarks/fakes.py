@@ -0,0 +1,66 @@
+import asyncio
+import time
+from typing import Optional
+
+from langchain_core.embeddings import DeterministicFakeEmbedding, Embeddings
+from langchain_core.language_models import FakeListChatModel
+
+EMBEDDING_SIZE = 1536
+ANSWER = (
+    "The termination clause allows either party to end the agreement with "
+    "thirty days written notice. Fees already invoiced remain payable."
+)
+
+
+class FakeEmbeddings(Embeddings):
+    """
+    Deterministic embeddings with an optional simulated request latency.
+    """
+
+    def __init__(self, size: int = EMBEDDING_SIZE, latency: float = 0.0):
+        self._embeddings = DeterministicFakeEmbedding(size=size)
+        self.latency = latency
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._embeddings.embed_query(text)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._embeddings.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._embeddings.embed_query(text)
+
+
+def install_fakes(
+    embedding_latency: float = 0.0, token_latency: Optional[float] = None
+) -> FakeEmbeddings:
+    """
+    Swap the OpenAI embeddings and chat model of every app singleton for
+    offline fakes. Must run before any chain is built.
+
+    :param embedding_latency: Seconds to wait per embedding request
+    :param token_latency: Seconds to wait per streamed answer character
+    :return: The installed embeddings
+    """
+    from src.chat import chains, process_pdf, vector_store
+
+    embeddings = FakeEmbeddings(latency=embedding_latency)
+    vector_store.embeddings = embeddings
+    vector_store.vector_store._embedding = embeddings
+    process_pdf.embedding_pipeline.embeddings = embeddings
+    chains.answer_cache.embeddings = embeddings
+    chains.chain_factory.llm = FakeListChatModel(
+        responses=[ANSWER], sleep=token_latency
+    )
+    return embeddings
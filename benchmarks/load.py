@@ -0,0 +1,434 @@
+"""
+End-to-end load generator for the ASGI app.
+
+Runs ``main:app`` in-process behind httpx's ASGI transport, with the
+lifespan (ingestion workers, parsing pool) started as in production and the
+OpenAI backends replaced by offline fakes. Virtual users repeatedly pick a
+scenario from a weighted mix:
+
+    newcomer   sign up and log in
+    reader     list documents, chats and a page of chat history
+    uploader   upload a PDF and poll its ingestion status until done
+    chatter    create a chat and send a multi-turn conversation
+
+Reports request throughput, latency percentiles per route, event-loop lag
+and the time spent waiting for a database connection.
+
+The ASGI transport returns a response once the app call finishes, so route
+latencies cover the whole body (all streamed tokens) and any background
+tasks, not the time to the first byte.
+
+Usage:
+    python -m benchmarks.load [--users 20] [--duration 30]
+        [--mix chatter=6,reader=2,uploader=1,newcomer=1]
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import shutil
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from benchmarks.environment import WORK_DIR
+from src.services.metrics import Histogram
+
+DEFAULT_MIX = "chatter=6,reader=2,uploader=1,newcomer=1"
+QUESTIONS = [
+    "What is the termination clause?",
+    "Which fees are payable after termination?",
+    "How much notice does the supplier need to give?",
+    "Summarize section 2.",
+    "Who owns the confidential information?",
+]
+
+
+def percentiles(samples: list[float]) -> dict:
+    if not samples:
+        return {"count": 0}
+    values = np.asarray(samples) * 1000
+    return {
+        "count": len(samples),
+        "p50_ms": round(float(np.percentile(values, 50)), 2),
+        "p95_ms": round(float(np.percentile(values, 95)), 2),
+        "p99_ms": round(float(np.percentile(values, 99)), 2),
+        "max_ms": round(float(values.max()), 2),
+    }
+
+
+def bucket_percentiles(
+    buckets: tuple[float, ...], counts: list[int], total: float
+) -> dict:
+    """
+    Percentiles of histogram observations, as the upper bound of the bucket
+    each falls in.
+    """
+    count = sum(counts)
+    if not count:
+        return {"count": 0}
+    bounds = buckets + (float("inf"),)
+
+    def percentile(q: float) -> float:
+        rank = q * count
+        cumulative = 0
+        for bound, n in zip(bounds, counts):
+            cumulative += n
+            if cumulative >= rank:
+                return bound * 1000
+        return float("inf")
+
+    return {
+        "count": count,
+        "mean_ms": round(total / count * 1000, 2),
+        "p50_ms": percentile(0.5),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+    }
+
+
+@dataclass
+class Recorder:
+    """
+    Request latencies per route, event-loop lag and DB pool waits.
+    Requests are only recorded while ``recording`` is set, so the setup of
+    each virtual user does not count.
+    """
+
+    recording: bool = False
+    latencies: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    loop_lag: list[float] = field(default_factory=list)
+    # The app's pool wait histogram of the primary database, read at start
+    # and stop.
+    pool_waits: Optional[Histogram] = None
+    pool_waits_start: tuple[list[int], float] = ([], 0.0)
+    pool_waits_stop: tuple[list[int], float] = ([], 0.0)
+    started: float = 0.0
+    finished: float = 0.0
+
+    def start(self) -> None:
+        self.recording = True
+        self.started = time.perf_counter()
+        if self.pool_waits is not None:
+            self.pool_waits_start = self.pool_waits.snapshot("primary")
+
+    def stop(self) -> None:
+        self.recording = False
+        self.finished = time.perf_counter()
+        if self.pool_waits is not None:
+            self.pool_waits_stop = self.pool_waits.snapshot("primary")
+
+    def pool_wait_report(self) -> dict:
+        if self.pool_waits is None:
+            return {"count": 0}
+        (start, start_sum), (stop, stop_sum) = (
+            self.pool_waits_start,
+            self.pool_waits_stop,
+        )
+        counts = [after - before for before, after in zip(start, stop)]
+        return bucket_percentiles(self.pool_waits.buckets, counts, stop_sum - start_sum)
+
+    def report(self) -> dict:
+        elapsed = self.finished - self.started
+        requests = sum(len(samples) for samples in self.latencies.values())
+        return {
+            "elapsed_s": round(elapsed, 2),
+            "requests": requests,
+            "throughput_rps": round(requests / elapsed, 1) if elapsed else 0.0,
+            "errors": dict(self.errors),
+            "routes": {
+                route: percentiles(samples)
+                for route, samples in sorted(self.latencies.items())
+            },
+            "event_loop_lag": percentiles(self.loop_lag),
+            "db_pool_wait": self.pool_wait_report(),
+        }
+
+
+async def monitor_loop_lag(recorder: Recorder, interval: float = 0.01) -> None:
+    # A sleep that overshoots its deadline means the loop was busy.
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        if recorder.recording:
+            recorder.loop_lag.append(time.perf_counter() - start - interval)
+
+
+class VirtualUser:
+    """
+    One simulated client with its own account, token and documents.
+    """
+
+    _ids = itertools.count()
+
+    def __init__(self, client, recorder: Recorder, args, pdf: Path):
+        self.client = client
+        self.recorder = recorder
+        self.args = args
+        self.pdf = pdf
+        self.number = next(self._ids)
+        self.email = f"user{self.number}-{os.getpid()}@example.com"
+        self.password = "load-test-password"
+        self.headers: dict[str, str] = {}
+        self.document_ids: list[int] = []
+        self.rng = random.Random(self.number)
+
+    async def request(self, method: str, route: str, **kwargs):
+        path = route.format(**kwargs.pop("path", {}))
+        start = time.perf_counter()
+        response = await self.client.request(
+            method, path, headers=self.headers, **kwargs
+        )
+        if self.recorder.recording:
+            name = f"{method} {route}"
+            self.recorder.latencies[name].append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                self.recorder.errors[f"{name} {response.status_code}"] += 1
+        return response
+
+    async def signup_and_login(self, email: str) -> dict[str, str]:
+        await self.request(
+            "POST", "/users/", json={"email": email, "password": self.password}
+        )
+        response = await self.request(
+            "POST",
+            "/users/login",
+            data={"username": email, "password": self.password},
+        )
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def upload(self) -> Optional[int]:
+        with self.pdf.open("rb") as f:
+            response = await self.request(
+                "POST",
+                "/documents/upload",
+                files={"file": (self.pdf.name, f, "application/pdf")},
+            )
+        if response.status_code != 202:
+            return None
+        document_id = response.json()["id"]
+        deadline = time.perf_counter() + self.args.upload_timeout
+        while True:
+            status = await self.request(
+                "GET", "/documents/{id}/status", path={"id": document_id}
+            )
+            state = status.json().get("status") if status.status_code == 200 else None
+            if state == "succeeded":
+                break
+            if state == "failed" or time.perf_counter() > deadline:
+                if self.recorder.recording:
+                    outcome = "failed" if state == "failed" else "timed out"
+                    self.recorder.errors[f"upload {outcome}"] += 1
+                return None
+            await asyncio.sleep(self.args.poll_interval)
+        self.document_ids.append(document_id)
+        return document_id
+
+    async def setup(self) -> None:
+        self.headers = await self.signup_and_login(self.email)
+        await self.upload()
+
+    async def newcomer(self) -> None:
+        # A separate account, so this user keeps its token and documents.
+        headers, self.headers = self.headers, {}
+        try:
+            await self.signup_and_login(
+                f"user{next(self._ids)}-{os.getpid()}@example.com"
+            )
+        finally:
+            self.headers = headers
+
+    async def reader(self) -> None:
+        await self.request("GET", "/documents/", params={"limit": 20})
+        if not self.document_ids:
+            return
+        document_id = self.rng.choice(self.document_ids)
+        chats = await self.request(
+            "GET", "/chat/document/{id}", path={"id": document_id}
+        )
+        if chats.status_code == 200 and chats.json():
+            chat_id = chats.json()[0]["id"]
+            await self.request(
+                "GET",
+                "/chat/history/{id}",
+                path={"id": chat_id},
+                params={"limit": 50},
+            )
+
+    async def uploader(self) -> None:
+        await self.upload()
+
+    async def chatter(self) -> None:
+        if not self.document_ids:
+            return
+        document_id = self.rng.choice(self.document_ids)
+        response = await self.request(
+            "POST", "/chat/", params={"document_id": document_id}
+        )
+        if response.status_code != 200:
+            return
+        chat_id = response.json()["id"]
+        for _ in range(self.args.turns):
+            body = {"chat_id": chat_id, "content": self.rng.choice(QUESTIONS)}
+            if self.rng.random() < self.args.stream_ratio:
+                await self.request("POST", "/chat/message/stream", json=body)
+            else:
+                await self.request("POST", "/chat/message", json=body)
+            await asyncio.sleep(self.args.think_time)
+
+    async def run(self, mix: dict[str, int], deadline: float) -> None:
+        while time.perf_counter() < deadline:
+            # A chatter needs a document, e.g. none if the setup upload failed.
+            runnable = {
+                name: weight
+                for name, weight in mix.items()
+                if name != "chatter" or self.document_ids
+            }
+            if not runnable:
+                return
+            scenarios, weights = zip(*runnable.items())
+            scenario = self.rng.choices(scenarios, weights)[0]
+            await getattr(self, scenario)()
+            # Scenarios that return early await nothing; let other users run.
+            await asyncio.sleep(0)
+
+
+def parse_mix(value: str) -> dict[str, int]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("newcomer", "reader", "uploader", "chatter"):
+            raise argparse.ArgumentTypeError(f"Unknown scenario: {name}")
+        mix[name] = int(weight or 1)
+    return mix
+
+
+async def run(args) -> dict:
+    # The app reads its settings on import, so it is only imported once the
+    # benchmark environment is in place.
+    import httpx
+
+    from benchmarks.fakes import install_fakes
+    from benchmarks.pdfs import generate_pdf
+    from main import app
+    from src.database.db import Base, engine, pool_wait_seconds
+
+    install_fakes(args.embedding_latency, args.token_latency or None)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    pdf = generate_pdf(WORK_DIR / "upload.pdf", args.upload_pages)
+    # Uploads are saved under ./storage.
+    os.chdir(WORK_DIR)
+
+    recorder = Recorder(pool_waits=pool_wait_seconds)
+    lag_monitor = asyncio.create_task(monitor_loop_lag(recorder))
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://load.test", timeout=None
+            ) as client:
+                users = [
+                    VirtualUser(client, recorder, args, pdf) for _ in range(args.users)
+                ]
+                await asyncio.gather(*(user.setup() for user in users))
+                recorder.start()
+                deadline = time.perf_counter() + args.duration
+                await asyncio.gather(*(user.run(args.mix, deadline) for user in users))
+                recorder.stop()
+    finally:
+        lag_monitor.cancel()
+    return recorder.report()
+
+
+def print_report(report: dict) -> None:
+    print(
+        f"{report['requests']} requests in {report['elapsed_s']}s, "
+        f"{report['throughput_rps']} req/s"
+    )
+    print(f"\n{'route':<32} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for route, stats in report["routes"].items():
+        print(
+            f"{route:<32} {stats['count']:>6} {stats['p50_ms']:>9.1f} "
+            f"{stats['p95_ms']:>9.1f} {stats['p99_ms']:>9.1f}"
+        )
+    stats = report["event_loop_lag"]
+    if stats["count"]:
+        print(
+            f"\nevent_loop_lag: p50 {stats['p50_ms']} ms, p99 {stats['p99_ms']} ms, "
+            f"max {stats['max_ms']} ms over {stats['count']} samples"
+        )
+    stats = report["db_pool_wait"]
+    if stats["count"]:
+        print(
+            f"\ndb_pool_wait: mean {stats['mean_ms']} ms, p50 <= {stats['p50_ms']} ms, "
+            f"p99 <= {stats['p99_ms']} ms over {stats['count']} checkouts"
+        )
+    if report["errors"]:
+        print("\nerrors:", json.dumps(report["errors"], indent=2))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX))
+    parser.add_argument("--turns", type=int, default=4, help="Messages per chat")
+    parser.add_argument(
+        "--stream-ratio", type=float, default=0.5, help="Share of streamed messages"
+    )
+    parser.add_argument("--think-time", type=float, default=0.0)
+    parser.add_argument("--upload-pages", type=int, default=10)
+    parser.add_argument("--poll-interval", type=float, default=0.1)
+    parser.add_argument(
+        "--upload-timeout",
+        type=float,
+        default=120.0,
+        help="Seconds to wait for an upload's ingestion before counting it failed",
+    )
+    parser.add_argument(
+        "--embedding-latency",
+        type=float,
+        default=0.05,
+        help="Simulated seconds per embedding request",
+    )
+    parser.add_argument(
+        "--token-latency",
+        type=float,
+        default=0.0,
+        help="Simulated seconds per streamed answer character",
+    )
+    parser.add_argument(
+        "--bcrypt-rounds", type=int, help="Override BCRYPT_ROUNDS for the run"
+    )
+    parser.add_argument("--output", type=Path, help="Write the report as JSON")
+    args = parser.parse_args()
+
+    if args.output:
+        # The run changes into the work directory.
+        args.output = args.output.resolve()
+    if args.bcrypt_rounds:
+        os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+    print_report(report)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
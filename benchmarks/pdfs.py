@@ -0,0 +1,54 @@
+import random
+from pathlib import Path
+
+VOCABULARY = (
+    "agreement party notice term clause shall payment delivery warranty "
+    "liability termination confidential obligation period written consent "
+    "section schedule invoice supplier customer service fee law court"
+).split()
+
+
+def generate_pdf(path: Path, pages: int, words_per_page: int = 350) -> Path:
+    """
+    Write a deterministic, uncompressed PDF with one text stream per page.
+
+    :param path: Where to write the PDF
+    :param pages: The number of pages
+    :param words_per_page: The number of words on each page
+    :return: The path of the PDF
+    """
+    rnd = random.Random(pages)
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [{}] /Count {} >>".format(
+            " ".join(f"{4 + 2 * i} 0 R" for i in range(pages)), pages
+        ),
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for page in range(pages):
+        words = [rnd.choice(VOCABULARY) for _ in range(words_per_page)]
+        lines = [
+            f"(Section {page}.{line // 12} {' '.join(words[line : line + 12])}) Tj T*"
+            for line in range(0, len(words), 12)
+        ]
+        stream = "BT /F1 10 Tf 12 TL 40 800 Td " + " ".join(lines) + " ET"
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * page} 0 R >>"
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+
+    out = "%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    out += (
+        f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+        f"startxref\n{xref}\n%%EOF\n"
+    )
+    path.write_text(out, encoding="latin-1")
+    return path
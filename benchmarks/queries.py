@@ -0,0 +1,76 @@
+"""
+Seed data and the hot repository queries, shared by the stage benchmarks
+and the query plan test.
+"""
+
+from datetime import timedelta
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import Chat, Document, IngestionJob, Message, User
+from src.database.repository.chat import (
+    get_chat_by_id,
+    get_chats_by_document_id,
+    get_messages_between,
+    get_recent_messages,
+    get_user_chat,
+    get_user_chats,
+    load_chat_history,
+)
+from src.database.repository.documents import get_user_document, get_users_documents
+from src.database.repository.ingestion import (
+    get_latest_document_job,
+    get_recoverable_jobs,
+)
+from src.database.repository.users import get_user_by_email
+from src.enums import JobStatus, Role
+
+USERS = 50
+DOCUMENTS_PER_USER = 4
+CHATS_PER_DOCUMENT = 3
+MESSAGES_PER_CHAT = 20
+
+# Each entry runs one repository query against the seeded database.
+QUERIES = {
+    "get_user_by_email": lambda db: get_user_by_email(db, "user7@example.com"),
+    "get_users_documents": lambda db: get_users_documents(db, 7, 50),
+    "get_users_documents_page": lambda db: get_users_documents(db, 7, 2, before_id=30),
+    "get_user_chats": lambda db: get_user_chats(db, 7),
+    "get_chat_by_id": lambda db: get_chat_by_id(db, 42),
+    "get_user_chat": lambda db: get_user_chat(db, 42, 4),
+    "get_user_document": lambda db: get_user_document(db, 42, 11),
+    "get_chats_by_document_id": lambda db: get_chats_by_document_id(db, 42, 50),
+    "load_chat_history": lambda db: load_chat_history(db, 42, 50),
+    "load_chat_history_page": lambda db: load_chat_history(db, 42, 10, after_id=830),
+    "get_recent_messages": lambda db: get_recent_messages(db, 42, 100, 20),
+    "get_messages_between": lambda db: get_messages_between(db, 42, 100, 900, 100),
+    "get_latest_document_job": lambda db: get_latest_document_job(db, 42),
+    "get_recoverable_jobs": lambda db: get_recoverable_jobs(
+        db, timedelta(minutes=10), include_queued=True
+    ),
+}
+
+
+async def seed(db: AsyncSession) -> None:
+    for u in range(1, USERS + 1):
+        user = User(email=f"user{u}@example.com", password="x")
+        db.add(user)
+        await db.flush()
+        for d in range(DOCUMENTS_PER_USER):
+            document = Document(name=f"{d}.pdf", file_path=f"{d}.pdf", user_id=user.id)
+            db.add(document)
+            await db.flush()
+            db.add(IngestionJob(document_id=document.id, status=JobStatus.SUCCEEDED))
+            for _ in range(CHATS_PER_DOCUMENT):
+                chat = Chat(document_id=document.id, user_id=user.id)
+                db.add(chat)
+                await db.flush()
+                db.add_all(
+                    Message(
+                        chat_id=chat.id,
+                        role=Role.HUMAN if m % 2 == 0 else Role.AI,
+                        content=f"message {m}",
+                    )
+                    for m in range(MESSAGES_PER_CHAT)
+                )
+    await db.commit()
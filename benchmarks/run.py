@@ -0,0 +1,163 @@
+"""
+Stage-level benchmarks for ingestion, chat and the repository queries.
+
+Runs fully offline: fake embeddings and chat model, the local vector store
+and SQLite in a temporary directory, and generated PDFs. Reports p50/p99
+latency, throughput and the peak RSS of the process (and of the parsing
+workers) after each benchmark, and compares the results with a baseline.
+
+Usage:
+    python -m benchmarks.run [--pages 10 100 1000] [--only ingest]
+        [--baseline benchmarks/baseline.json] [--save-baseline] [--check]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shutil
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.environment import WORK_DIR
+
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+
+
+def _children_peak_rss_kb() -> int:
+    # RUSAGE_CHILDREN only covers children that exited, so read the
+    # high-water mark of the live parsing workers from /proc.
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    parent = f"PPid:\t{os.getpid()}\n"
+    for status in Path("/proc").glob("[0-9]*/status"):
+        try:
+            text = status.read_text()
+        except OSError:
+            continue
+        if parent in text:
+            for line in text.splitlines():
+                if line.startswith("VmHWM:"):
+                    peak = max(peak, int(line.split()[1]))
+    return peak
+
+
+def peak_rss_mb() -> tuple[float, float]:
+    # ru_maxrss is in KiB on Linux; it is a high-water mark, so it only grows
+    # from one benchmark to the next.
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return own, _children_peak_rss_kb() / 1024
+
+
+def summarize(samples: list[float], items: int, unit: str) -> dict:
+    durations = np.asarray(samples)
+    own_rss, children_rss = peak_rss_mb()
+    return {
+        "runs": len(samples),
+        "p50_ms": float(np.percentile(durations, 50) * 1000),
+        "p99_ms": float(np.percentile(durations, 99) * 1000),
+        "throughput": items / float(durations.sum()) if durations.sum() else 0.0,
+        "unit": unit,
+        "peak_rss_mb": round(own_rss, 1),
+        "workers_peak_rss_mb": round(children_rss, 1),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Print each benchmark's change against the baseline.
+
+    :return: The names of the benchmarks that regressed by more than the
+        tolerance in p50 latency or throughput
+    """
+    regressions = []
+    print(f"\n{'benchmark':<40} {'p50 Δ':>9} {'throughput Δ':>13}")
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            print(f"{name:<40} {'new':>9}")
+            continue
+        p50_change = result["p50_ms"] / previous["p50_ms"] - 1
+        throughput_change = result["throughput"] / previous["throughput"] - 1
+        regressed = p50_change > tolerance or throughput_change < -tolerance
+        if regressed:
+            regressions.append(name)
+        print(
+            f"{name:<40} {p50_change:>+9.1%} {throughput_change:>+13.1%}"
+            + ("  REGRESSION" if regressed else "")
+        )
+    return regressions
+
+
+async def run(args) -> dict:
+    # The app modules read their settings on import, so they are only
+    # imported once the benchmark environment is in place.
+    from benchmarks import stages
+
+    context = await stages.prepare(args.pages, args.embedding_latency)
+    results = {}
+    print(
+        f"{'benchmark':<40} {'runs':>5} {'p50 ms':>10} {'p99 ms':>10} "
+        f"{'throughput':>22} {'RSS MB':>8} {'workers':>8}"
+    )
+    try:
+        for benchmark in stages.build_benchmarks(context, args.pages, args.repeat):
+            if args.only and not any(part in benchmark.name for part in args.only):
+                continue
+            samples, items = await stages.measure(benchmark)
+            result = summarize(samples, items, benchmark.unit)
+            results[benchmark.name] = result
+            print(
+                f"{benchmark.name:<40} {result['runs']:>5} "
+                f"{result['p50_ms']:>10.2f} {result['p99_ms']:>10.2f} "
+                f"{result['throughput']:>12.1f} {benchmark.unit + '/s':<9} "
+                f"{result['peak_rss_mb']:>8.1f} {result['workers_peak_rss_mb']:>8.1f}"
+            )
+    finally:
+        stages.shutdown()
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--only", nargs="+", help="Run benchmarks matching these")
+    parser.add_argument(
+        "--embedding-latency",
+        type=float,
+        default=0.0,
+        help="Simulated seconds per embedding request",
+    )
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument(
+        "--check", action="store_true", help="Exit with 1 on regressions"
+    )
+    parser.add_argument("--output", type=Path, help="Write the results as JSON")
+    parser.add_argument("--keep", action="store_true", help=f"Keep {WORK_DIR}")
+    args = parser.parse_args()
+
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        if not args.keep:
+            shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2) + "\n")
+    regressions = []
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"\nBaseline written to {args.baseline}")
+    elif args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())
+        regressions = compare(results, baseline, args.tolerance)
+    return 1 if args.check and regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
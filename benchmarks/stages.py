@@ -0,0 +1,195 @@
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from benchmarks.environment import WORK_DIR
+from benchmarks.fakes import install_fakes
+from benchmarks.pdfs import generate_pdf
+from benchmarks.queries import QUERIES, seed
+from src.chat.chains import build_rag_chain
+from src.chat.history import load_chat_context
+from src.chat.parsing_pool import iter_document_chunks
+from src.chat.process_pdf import create_embeddings_for_pdf, parsing_pool
+from src.chat.vector_store import lexical_index, vector_store
+from src.database.db import Base, async_session, engine
+from src.database.models import Chat, Message
+from src.database.repository.chat import get_chat_by_id, load_chat_history
+from src.enums import Role
+
+# Chat and document used by the chat benchmarks; created by ``prepare``.
+CHAT_DOCUMENT_ID = 1
+LONG_CHAT_MESSAGES = 1_000
+# Document IDs for ingestion runs, far from the seeded ones.
+INGEST_DOCUMENT_ID = 1_000_000
+
+
+@dataclass
+class Benchmark:
+    """
+    One measured operation. ``run`` returns the number of items it
+    processed (pages, messages, ...) so throughput can be reported per item.
+    """
+
+    name: str
+    run: Callable[[], Awaitable[int]]
+    repeat: int
+    unit: str = "op"
+    warmup: int = 1
+    cleanup: Optional[Callable[[], Awaitable[None]]] = None
+
+
+@dataclass
+class Context:
+    pdfs: dict[int, Path] = field(default_factory=dict)
+    long_chat_id: int = 0
+
+
+async def prepare(page_counts: list[int], embedding_latency: float) -> Context:
+    """
+    Create a fresh SQLite database seeded like the query plan test, one
+    long chat, the generated PDFs and an ingested document to chat with.
+    """
+    install_fakes(embedding_latency)
+    context = Context()
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_session() as db:
+        await seed(db)
+        chat = Chat(document_id=CHAT_DOCUMENT_ID, user_id=1)
+        db.add(chat)
+        await db.flush()
+        db.add_all(
+            Message(
+                chat_id=chat.id,
+                role=Role.HUMAN if m % 2 == 0 else Role.AI,
+                content=f"Question {m} about the termination clause and fees?",
+            )
+            for m in range(LONG_CHAT_MESSAGES)
+        )
+        await db.commit()
+        context.long_chat_id = chat.id
+
+    pdf_dir = WORK_DIR / "pdfs"
+    pdf_dir.mkdir(exist_ok=True)
+    for pages in sorted(set(page_counts) | {10}):
+        context.pdfs[pages] = generate_pdf(pdf_dir / f"{pages}.pdf", pages)
+    await create_embeddings_for_pdf(CHAT_DOCUMENT_ID, str(context.pdfs[10]))
+    return context
+
+
+def ingest_repeat(pages: int) -> int:
+    return max(1, min(5, 500 // pages))
+
+
+def build_benchmarks(context: Context, page_counts: list[int], repeat: int):
+    benchmarks = []
+
+    for pages in page_counts:
+        path = str(context.pdfs[pages])
+
+        async def split(path=path, pages=pages) -> int:
+            for _ in iter_document_chunks(path, parsing_pool.pages_per_task):
+                pass
+            return pages
+
+        async def ingest(path=path, pages=pages) -> int:
+            await create_embeddings_for_pdf(INGEST_DOCUMENT_ID, path)
+            return pages
+
+        async def remove_ingested() -> None:
+            vector_store.delete_document(INGEST_DOCUMENT_ID)
+            lexical_index.delete(INGEST_DOCUMENT_ID)
+
+        benchmarks.append(
+            Benchmark(f"split[{pages}p]", split, ingest_repeat(pages), "page", 0)
+        )
+        benchmarks.append(
+            Benchmark(
+                f"ingest[{pages}p]",
+                ingest,
+                ingest_repeat(pages),
+                "page",
+                0,
+                remove_ingested,
+            )
+        )
+
+    async def history_page() -> int:
+        async with async_session() as db:
+            return len(await load_chat_history(db, context.long_chat_id, 50))
+
+    async def chat_context() -> int:
+        async with async_session() as db:
+            chat = await get_chat_by_id(db, context.long_chat_id)
+            return len(await load_chat_context(db, chat))
+
+    async def rag_chain() -> int:
+        async with async_session() as db:
+            chat = await get_chat_by_id(db, context.long_chat_id)
+            await build_rag_chain(chat, db)
+        return 1
+
+    async def chat_turn() -> int:
+        async with async_session() as db:
+            chat = await get_chat_by_id(db, context.long_chat_id)
+            chain, history = await build_rag_chain(chat, db)
+        await chain.ainvoke(
+            {"input": "What is the termination clause?", "chat_history": history}
+        )
+        return 1
+
+    async def chat_turn_stream() -> int:
+        async with async_session() as db:
+            chat = await get_chat_by_id(db, context.long_chat_id)
+            chain, history = await build_rag_chain(chat, db)
+        tokens = 0
+        async for _ in chain.astream(
+            {"input": "What is the termination clause?", "chat_history": history}
+        ):
+            tokens += 1
+        return tokens
+
+    benchmarks += [
+        Benchmark("load_chat_history", history_page, repeat, "message"),
+        Benchmark("load_chat_context", chat_context, repeat, "message"),
+        Benchmark("build_rag_chain", rag_chain, repeat),
+        Benchmark("chat_turn", chat_turn, repeat),
+        Benchmark("chat_turn_stream", chat_turn_stream, repeat, "token"),
+    ]
+
+    for name, query in QUERIES.items():
+
+        async def run_query(query=query) -> int:
+            async with async_session() as db:
+                await query(db)
+            return 1
+
+        benchmarks.append(Benchmark(f"query[{name}]", run_query, repeat * 5))
+    return benchmarks
+
+
+async def measure(benchmark: Benchmark) -> tuple[list[float], int]:
+    """
+    :return: The duration of every measured run in seconds, and the items
+        processed by all of them
+    """
+    for _ in range(benchmark.warmup):
+        await benchmark.run()
+        if benchmark.cleanup:
+            await benchmark.cleanup()
+    samples = []
+    items = 0
+    for _ in range(benchmark.repeat):
+        start = time.perf_counter()
+        items += await benchmark.run()
+        samples.append(time.perf_counter() - start)
+        if benchmark.cleanup:
+            await benchmark.cleanup()
+    return samples, items
+
+
+def shutdown() -> None:
+    parsing_pool.stop()
@@ -1,12 +1,37 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from src.chat.process_pdf import parsing_pool
 from src.routes.chat import router as chat_router
+from src.routes.metrics import router as metrics_router
 from src.routes.users import router as users_router
 from src.routes.documents import router as documents_router
+from src.services.auth import auth_service
+from src.services.ingestion import ingestion_queue
+from src.services.message_writer import message_writer
+from src.services.metrics import ServerTimingMiddleware
+from src.services.uploads import RequestSizeLimitMiddleware
+from src.settings import settings
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    parsing_pool.start()
+    await ingestion_queue.start()
+    message_writer.start()
+    yield
+    await message_writer.stop()
+    await ingestion_queue.stop()
+    parsing_pool.stop()
+    auth_service.hashing_pool.stop()
 
-app = FastAPI()
 
+app = FastAPI(lifespan=lifespan)
+
+# Added before CORS so that its 413 responses carry the CORS headers.
+app.add_middleware(RequestSizeLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
@@ -19,12 +44,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.metrics_enabled:
+    app.add_middleware(ServerTimingMiddleware, header=settings.server_timing_enabled)
+
 app.include_router(chat_router)
 app.include_router(users_router)
 app.include_router(documents_router)
+if settings.metrics_enabled and settings.metrics_endpoint_enabled:
+    app.include_router(metrics_router)
 
 
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(
+        app, host="0.0.0.0", port=8000, ws_max_size=settings.ws_max_frame_bytes
+    )
@@ -0,0 +1,162 @@
+import hashlib
+from typing import AsyncIterator, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import Runnable, RunnableGenerator
+
+from src.services.cache import LRUCache
+from src.services.metrics import stage
+from src.settings import settings
+
+
+def _question_key(question: str) -> str:
+    normalized = " ".join(question.lower().split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def _depends_on_history(input_data: dict) -> bool:
+    history = input_data.get("chat_history") or []
+    # The history ends with the question itself.
+    last = history[-1] if history else None
+    if isinstance(last, HumanMessage) and last.content == input_data["input"]:
+        history = history[:-1]
+    return bool(history)
+
+
+class SemanticAnswerCache:
+    """
+    Answers to standalone questions, per document. A question is answered
+    from the cache when it is textually identical to a cached one, or when
+    the cosine similarity of their embeddings reaches ``threshold``.
+
+    Documents and the answers within each document are evicted least
+    recently used first, and answers expire after ``ttl`` seconds.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        threshold: float,
+        ttl: float,
+        max_documents: int,
+        max_answers_per_document: int,
+    ):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_answers_per_document = max_answers_per_document
+        self.hits = 0
+        self.misses = 0
+        # document_id -> question key -> (normalized embedding, answer)
+        self._documents: LRUCache[LRUCache[tuple[np.ndarray, str]]] = LRUCache(
+            max_documents
+        )
+
+    async def _embed(self, question: str) -> np.ndarray:
+        vector = np.asarray(
+            await self.embeddings.aembed_query(question), dtype=np.float32
+        )
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    async def lookup(
+        self, document_id: int, question: str
+    ) -> tuple[Optional[str], Optional[np.ndarray]]:
+        """
+        Find a cached answer for a question about a document.
+
+        :param document_id: The document asked about
+        :param question: The standalone question
+        :return: The cached answer, or None, and the question's embedding if
+            it had to be computed
+        """
+        answers = self._documents.get(document_id)
+        if answers is None:
+            self.misses += 1
+            return None, None
+        exact = answers.get(_question_key(question))
+        if exact is not None:
+            self.hits += 1
+            return exact[1], exact[0]
+
+        entries = answers.items()
+        vector = await self._embed(question)
+        if entries:
+            similarities = np.stack([entry[0] for _, entry in entries]) @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                key, (_, answer) = entries[best]
+                answers.get(key)  # mark as recently used
+                self.hits += 1
+                return answer, vector
+        self.misses += 1
+        return None, vector
+
+    async def store(
+        self,
+        document_id: int,
+        question: str,
+        answer: str,
+        vector: Optional[np.ndarray] = None,
+    ) -> None:
+        if vector is None:
+            vector = await self._embed(question)
+        answers = self._documents.get(document_id)
+        if answers is None:
+            answers = LRUCache(self.max_answers_per_document, ttl=self.ttl)
+            self._documents.set(document_id, answers)
+        answers.set(_question_key(question), (vector, answer))
+
+    def invalidate(self, document_id: int) -> None:
+        self._documents.pop(document_id)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def wrap(self, chain: Runnable, document_id: int) -> Runnable:
+        """
+        Serve a chain's answers from the cache. Turns with earlier chat
+        history bypass the cache: the standalone question and the answer
+        both depend on the conversation.
+
+        :param chain: The RAG chain, taking "input" and "chat_history"
+        :param document_id: The document the chain answers about
+        :return: A runnable that streams the cached answer as a single chunk
+            on a hit, or streams the chain and caches its answer on a miss
+        """
+
+        async def answer(inputs: AsyncIterator[dict]) -> AsyncIterator[str]:
+            input_data = None
+            async for input_data in inputs:
+                pass
+            if _depends_on_history(input_data):
+                async for token in chain.astream(input_data):
+                    yield token
+                return
+            question = input_data["input"]
+            with stage("answer_cache"):
+                cached, vector = await self.lookup(document_id, question)
+            if cached is not None:
+                yield cached
+                return
+            tokens = []
+            async for token in chain.astream(input_data):
+                tokens.append(token)
+                yield token
+            # Only reached when the stream completed.
+            await self.store(document_id, question, "".join(tokens), vector)
+
+        return RunnableGenerator(answer)
+
+
+def create_answer_cache(embeddings: Embeddings) -> SemanticAnswerCache:
+    return SemanticAnswerCache(
+        embeddings,
+        threshold=settings.answer_cache_threshold,
+        ttl=settings.answer_cache_ttl,
+        max_documents=settings.answer_cache_documents,
+        max_answers_per_document=settings.answer_cache_per_document,
+    )
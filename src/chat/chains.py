@@ -1,62 +1,250 @@
+import time
+from typing import Any, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
 from langchain_openai import ChatOpenAI
 from langchain.chains import create_history_aware_retriever
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import Runnable
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.chat.vector_store import build_retriever
-from src.database.repository.chat import load_chat_history
+from src.chat.answer_cache import create_answer_cache
+from src.chat.history import (
+    load_chat_context,
+    load_recent_messages,
+    message_tokens,
+    truncate_tokens,
+)
+from src.chat.speculative_retriever import (
+    SpeculationStats,
+    create_speculative_history_aware_retriever,
+)
+from src.chat.vector_store import build_retriever, embeddings
+from src.database.db import async_session
+from src.database.models import Chat
+from src.database.repository.chat import (
+    get_chat_by_id,
+    get_messages_between,
+    save_chat_summary,
+)
+from src.services.cache import LRUCache
+from src.services.metrics import record_stage, stage
+from src.settings import settings
+
+contextualize_q_system_prompt = """Given a chat history and the latest user question \
+which might reference context in the chat history, formulate a standalone question \
+which can be understood without the chat history. Do NOT answer the question, \
+just reformulate it if needed and otherwise return it as is."""
+
+contextualize_q_prompt = ChatPromptTemplate.from_messages(
+    [
+        ("system", contextualize_q_system_prompt),
+        MessagesPlaceholder("chat_history"),
+        ("human", "{input}"),
+    ]
+)
+
+qa_system_prompt = """You are an assistant for question-answering tasks. \
+Use the following pieces of retrieved context to answer the question. \
+If you don't know the answer, just say that you don't know. \
+Use three sentences maximum and keep the answer concise.\
+{context}"""
+
+qa_prompt = ChatPromptTemplate.from_messages(
+    [
+        ("system", qa_system_prompt),
+        MessagesPlaceholder("chat_history"),
+        ("human", "{input}"),
+    ]
+)
+
+summary_system_prompt = """Progressively summarize the conversation between a user \
+and an assistant about a document. Extend the current summary with the new lines, \
+keeping names, numbers and facts the user may refer to later. \
+Keep the updated summary under {max_words} words, condensing or dropping the \
+least important earlier details to make room. \
+Return only the updated summary."""
+
+summary_prompt = ChatPromptTemplate.from_messages(
+    [
+        ("system", summary_system_prompt),
+        ("human", "Current summary:\n{summary}\n\nNew lines:\n{new_lines}"),
+    ]
+)
 
 
 def format_docs(docs):
     return "\n\n".join(doc.page_content for doc in docs)
 
 
-async def build_rag_chain(document_id: int, chat_id: int, db: AsyncSession):
-    retriever = build_retriever(document_id)
-    llm = ChatOpenAI(temperature=0.5)
-
-    contextualize_q_system_prompt = """Given a chat history and the latest user question \
-    which might reference context in the chat history, formulate a standalone question \
-    which can be understood without the chat history. Do NOT answer the question, \
-    just reformulate it if needed and otherwise return it as is."""
-
-    contextualize_q_prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system", contextualize_q_system_prompt),
-            MessagesPlaceholder("chat_history"),
-            ("human", "{input}"),
-        ]
-    )
-
-    history_aware_retriever = create_history_aware_retriever(
-        llm, retriever, contextualize_q_prompt
-    )
-
-    qa_system_prompt = """You are an assistant for question-answering tasks. \
-    Use the following pieces of retrieved context to answer the question. \
-    If you don't know the answer, just say that you don't know. \
-    Use three sentences maximum and keep the answer concise.\
-    {context}"""
-
-    qa_prompt = ChatPromptTemplate.from_messages(
-        [
-            ("system", qa_system_prompt),
-            MessagesPlaceholder("chat_history"),
-            ("human", "{input}"),
-        ]
-    )
-
-    rag_chain = (
-        {
-            "context": history_aware_retriever,
-            "input": lambda x: x["input"],
-            "chat_history": lambda x: x["chat_history"],
-        }
-        | qa_prompt
-        | llm
-        | StrOutputParser()
-    )
-
-    chat_history = await load_chat_history(db, chat_id)
-    return rag_chain, chat_history.messages
+def _stage_name(tags: Optional[list[str]], default: str) -> str:
+    return next((tag[6:] for tag in tags or () if tag.startswith("stage:")), default)
+
+
+class StageTimer(BaseCallbackHandler):
+    """
+    Times the LLM calls and retrievals of a chain as stages, named by their
+    ``stage:<name>`` tag if they have one. Retrievals nested in another timed
+    retrieval, like the vector search of a hybrid retriever, are not
+    counted twice.
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self._runs: dict[UUID, tuple[str, float]] = {}
+
+    def _start(self, name: str, run_id: UUID, parent_run_id: Optional[UUID]):
+        if parent_run_id not in self._runs:
+            self._runs[run_id] = (name, time.perf_counter())
+
+    def _end(self, run_id: UUID) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is not None:
+            record_stage(run[0], time.perf_counter() - run[1])
+
+    def on_chat_model_start(
+        self, serialized, messages, *, run_id, parent_run_id=None, tags=None, **kwargs
+    ) -> Any:
+        self._start(_stage_name(tags, "llm"), run_id, parent_run_id)
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> Any:
+        self._end(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> Any:
+        self._end(run_id)
+
+    def on_retriever_start(
+        self, serialized, query, *, run_id, parent_run_id=None, tags=None, **kwargs
+    ) -> Any:
+        self._start(_stage_name(tags, "retrieval"), run_id, parent_run_id)
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs) -> Any:
+        self._end(run_id)
+
+    def on_retriever_error(self, error, *, run_id, **kwargs) -> Any:
+        self._end(run_id)
+
+
+class ChainFactory:
+    """
+    Builds RAG chains and keeps the most recently used ones per document, so
+    the prompts, retriever and history-aware retriever are built once per hot
+    document. All chains share one LLM client and its HTTP connection pool.
+
+    With ``settings.speculative_retrieval``, retrieval on the raw input runs
+    in parallel with the question rewrite; see ``speculation_stats``.
+    """
+
+    def __init__(self, maxsize: int):
+        self.llm = ChatOpenAI(temperature=0.5)
+        self.speculation_stats = SpeculationStats()
+        self.stage_timer = StageTimer()
+        self._chains: LRUCache[Runnable] = LRUCache(maxsize)
+
+    def _build(self, document_id: int) -> Runnable:
+        retriever = build_retriever(document_id)
+        rewrite_llm = self.llm.with_config(tags=["stage:rewrite"])
+        if settings.speculative_retrieval:
+            history_aware_retriever = create_speculative_history_aware_retriever(
+                rewrite_llm,
+                retriever,
+                contextualize_q_prompt,
+                self.speculation_stats,
+                settings.speculative_rewrite_threshold,
+            )
+        else:
+            history_aware_retriever = create_history_aware_retriever(
+                rewrite_llm, retriever, contextualize_q_prompt
+            )
+        return (
+            {
+                "context": history_aware_retriever,
+                "input": lambda x: x["input"],
+                "chat_history": lambda x: x["chat_history"],
+            }
+            | qa_prompt
+            | self.llm.with_config(tags=["stage:generation"])
+            | StrOutputParser()
+        ).with_config(callbacks=[self.stage_timer])
+
+    def get(self, document_id: int) -> Runnable:
+        chain = self._chains.get(document_id)
+        if chain is None:
+            chain = self._build(document_id)
+            self._chains.set(document_id, chain)
+        return chain
+
+    def invalidate(self, document_id: int) -> None:
+        self._chains.pop(document_id)
+
+
+chain_factory = ChainFactory(settings.chain_cache_size)
+answer_cache = create_answer_cache(embeddings)
+
+
+def get_rag_chain(document_id: int) -> Runnable:
+    rag_chain = chain_factory.get(document_id)
+    if settings.answer_cache_enabled:
+        rag_chain = answer_cache.wrap(rag_chain, document_id)
+    return rag_chain
+
+
+async def build_rag_chain(chat: Chat, db: AsyncSession, question: Optional[str] = None):
+    rag_chain = get_rag_chain(chat.document_id)
+    with stage("history"):
+        chat_history = await load_chat_context(db, chat, question)
+    return rag_chain, chat_history
+
+
+async def update_chat_summary(chat_id: int) -> None:
+    """
+    Fold the messages that no longer fit in the history token budget into the
+    chat's rolling summary. Runs after a turn in its own session; the summary
+    is only refreshed once enough tokens have fallen out of the budget. Each
+    refresh folds at most one history budget of messages, and the summary is
+    kept to ``settings.history_summary_max_tokens``, so its cost stays flat.
+
+    :param chat_id: The chat to summarize
+    """
+    async with async_session() as db:
+        chat = await get_chat_by_id(db, chat_id)
+        if chat is None:
+            return
+        recent, truncated = await load_recent_messages(db, chat)
+        if not truncated or not recent:
+            return
+        candidates = await get_messages_between(
+            db,
+            chat.id,
+            chat.summarized_until_id,
+            recent[0].id,
+            settings.history_max_messages,
+        )
+        # A long backlog is folded over the following refreshes.
+        older = []
+        tokens = 0
+        for message in candidates:
+            size = message_tokens(message)
+            if older and tokens + size > settings.history_token_budget:
+                break
+            older.append(message)
+            tokens += size
+        if tokens < settings.history_summary_min_tokens:
+            return
+        new_lines = "\n".join(f"{m.role.value}: {m.content}" for m in older)
+        summarizer = summary_prompt | chain_factory.llm | StrOutputParser()
+        max_tokens = settings.history_summary_max_tokens
+        with stage("summary"):
+            summary = await summarizer.ainvoke(
+                {
+                    "summary": chat.summary or "",
+                    "new_lines": new_lines,
+                    # About three words per four tokens.
+                    "max_words": max_tokens * 3 // 4,
+                }
+            )
+        summary = truncate_tokens(summary, max_tokens)
+        await save_chat_summary(db, chat.id, summary, older[-1].id)
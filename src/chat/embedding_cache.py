@@ -0,0 +1,186 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterator, Optional, Sequence
+
+import numpy as np
+from langchain.embeddings import CacheBackedEmbeddings
+from langchain.storage.encoder_backed import EncoderBackedStore
+from langchain_core.embeddings import Embeddings
+from langchain_core.stores import ByteStore
+
+
+class SQLiteLRUStore(ByteStore):
+    """
+    Persistent key-value store in a SQLite table with least-recently-used
+    eviction once the table holds more than ``max_entries`` rows. The row
+    count is kept as writes happen and recounted every ``RECOUNT_WRITES``
+    writes, which also picks up rows written by other processes.
+    """
+
+    RECOUNT_WRITES = 1_000
+
+    def __init__(self, path: str, table: str, max_entries: int):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.table = table
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} "
+            "(key TEXT PRIMARY KEY, value BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_last_used ON {table} (last_used)"
+        )
+        self._conn.commit()
+        self._count = self._recount()
+        self._writes = 0
+
+    def _recount(self) -> int:
+        (count,) = self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+        return count
+
+    def mget(self, keys: Sequence[str]) -> list[Optional[bytes]]:
+        if not keys:
+            return []
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, value FROM {self.table} WHERE key IN ({placeholders})",
+                list(keys),
+            ).fetchall()
+            found = dict(rows)
+            if found:
+                self._conn.execute(
+                    f"UPDATE {self.table} SET last_used = ? "
+                    f"WHERE key IN ({','.join('?' * len(found))})",
+                    [time.time(), *found],
+                )
+                self._conn.commit()
+        return [found.get(key) for key in keys]
+
+    def mset(self, key_value_pairs: Sequence[tuple[str, bytes]]) -> None:
+        now = time.time()
+        values = dict(key_value_pairs)
+        if not values:
+            return
+        with self._lock:
+            (existing,) = self._conn.execute(
+                f"SELECT COUNT(*) FROM {self.table} "
+                f"WHERE key IN ({','.join('?' * len(values))})",
+                list(values),
+            ).fetchone()
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, last_used) "
+                "VALUES (?, ?, ?)",
+                [(key, value, now) for key, value in values.items()],
+            )
+            self._count += len(values) - existing
+            self._writes += 1
+            if self._writes % self.RECOUNT_WRITES == 0:
+                self._count = self._recount()
+            self._evict()
+            self._conn.commit()
+
+    def mdelete(self, keys: Sequence[str]) -> None:
+        with self._lock:
+            cursor = self._conn.executemany(
+                f"DELETE FROM {self.table} WHERE key = ?", [(key,) for key in keys]
+            )
+            self._count -= cursor.rowcount
+            self._conn.commit()
+
+    def yield_keys(self, prefix: Optional[str] = None) -> Iterator[str]:
+        with self._lock:
+            if prefix:
+                rows = self._conn.execute(
+                    f"SELECT key FROM {self.table} WHERE key LIKE ?", (prefix + "%",)
+                ).fetchall()
+            else:
+                rows = self._conn.execute(f"SELECT key FROM {self.table}").fetchall()
+        for (key,) in rows:
+            yield key
+
+    def _evict(self) -> None:
+        overflow = self._count - self.max_entries
+        if overflow > 0:
+            cursor = self._conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f"SELECT key FROM {self.table} ORDER BY last_used LIMIT ?)",
+                (overflow,),
+            )
+            self._count -= cursor.rowcount
+
+
+def _serialize_vector(vector: Sequence[float]) -> bytes:
+    return np.asarray(vector, dtype=np.float32).tobytes()
+
+
+def _deserialize_vector(value: bytes) -> list[float]:
+    return np.frombuffer(value, dtype=np.float32).tolist()
+
+
+def cached_embeddings(
+    underlying: Embeddings, path: str, max_entries: int
+) -> CacheBackedEmbeddings:
+    """
+    Wrap an embedding model with a persistent cache keyed by the SHA-256 of
+    the text and the model name, so identical chunks are embedded only once.
+    Queries share the cache, so a question embedded once (e.g. by the answer
+    cache) is not embedded again by the retriever.
+
+    :param underlying: The embedding model to wrap
+    :param path: The SQLite file holding the cache
+    :param max_entries: The maximum number of cached vectors
+    :return: The cache-backed embedding model
+    """
+    model = getattr(underlying, "model", type(underlying).__name__)
+
+    def key_encoder(text: str) -> str:
+        return f"{model}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+    store = EncoderBackedStore(
+        SQLiteLRUStore(path, "embeddings", max_entries),
+        key_encoder,
+        _serialize_vector,
+        _deserialize_vector,
+    )
+    return CacheBackedEmbeddings(underlying, store, query_embedding_store=store)
+
+
+class FileChunkCache:
+    """
+    Split chunks of previously ingested files, keyed by the SHA-256 of the
+    file, so that a byte-identical re-upload skips parsing and splitting.
+    Keys also hold ``chunking``, the splitter version and parameters, so
+    chunks split differently are never served after the splitting changes.
+    """
+
+    def __init__(self, path: str, max_entries: int, chunking: str):
+        self._store = SQLiteLRUStore(path, "file_chunks", max_entries)
+        self.chunking = chunking
+
+    def _key(self, file_hash: str) -> str:
+        return f"{self.chunking}:{file_hash}"
+
+    def get(self, file_hash: str) -> Optional[list[tuple[int, str]]]:
+        (value,) = self._store.mget([self._key(file_hash)])
+        if value is None:
+            return None
+        return [tuple(chunk) for chunk in json.loads(value)]
+
+    def set(self, file_hash: str, chunks: list[tuple[int, str]]) -> None:
+        self._store.mset([(self._key(file_hash), json.dumps(chunks).encode("utf-8"))])
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
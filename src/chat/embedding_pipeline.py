@@ -0,0 +1,240 @@
+import asyncio
+import logging
+import random
+import time
+from typing import AsyncIterable, Awaitable, Callable, Iterable, Optional, Union
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from src.services.metrics import stage
+from src.settings import settings
+
+logger = logging.getLogger(__name__)
+
+Upsert = Callable[
+    [list[str], list[list[float]], list[dict], Optional[list[str]]],
+    Awaitable[list[str]],
+]
+ProgressCallback = Callable[[str, int, Optional[int]], Awaitable[None]]
+
+
+class TokenBucket:
+    """
+    Token bucket with additive-increase / multiplicative-decrease of its rate:
+    every rate-limit response halves the rate, every success recovers a bit.
+    """
+
+    def __init__(self, per_minute: int):
+        self.max_rate = per_minute / 60
+        self.rate = self.max_rate
+        self.capacity = max(per_minute / 6, 1)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    async def acquire(self, amount: float = 1) -> None:
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def penalize(self) -> None:
+        self.rate = max(self.rate / 2, self.max_rate / 20)
+
+    def reward(self) -> None:
+        self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+def _is_rate_limited(error: Exception) -> bool:
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    return status == 429
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _estimate_tokens(texts: list[str]) -> int:
+    return sum(len(text) // 4 + 1 for text in texts)
+
+
+class EmbeddingPipeline:
+    """
+    Embeds and upserts chunks in batches. Embedding and upsert requests are
+    bounded by separate semaphores and run concurrently, so the upsert of
+    batch N overlaps with the embedding of batch N+1. Embedding requests are
+    paced by request and token buckets; both kinds of request are retried
+    with backoff on 429.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        upsert: Upsert,
+        batch_size: int,
+        embed_concurrency: int,
+        upsert_concurrency: int,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        max_retries: int,
+    ):
+        self.embeddings = embeddings
+        self.upsert = upsert
+        self.batch_size = batch_size
+        self.embed_concurrency = embed_concurrency
+        self.upsert_concurrency = upsert_concurrency
+        self.max_retries = max_retries
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self._embed_semaphore = asyncio.Semaphore(embed_concurrency)
+        self._upsert_semaphore = asyncio.Semaphore(upsert_concurrency)
+
+    async def _with_backoff(
+        self,
+        name: str,
+        call: Callable[[], Awaitable],
+        buckets: tuple[TokenBucket, ...] = (),
+    ):
+        """
+        Await ``call``, retrying it with backoff on 429. Only ``buckets``,
+        those pacing the throttled backend, are slowed down or sped up.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                result = await call()
+            except Exception as e:
+                if not _is_rate_limited(e) or attempt == self.max_retries:
+                    raise
+                for bucket in buckets:
+                    bucket.penalize()
+                delay = _retry_after(e) or min(60.0, 2**attempt)
+                delay *= random.uniform(1.0, 1.5)
+                logger.warning("%s rate limited, retrying in %.1fs", name, delay)
+                await asyncio.sleep(delay)
+            else:
+                for bucket in buckets:
+                    bucket.reward()
+                return result
+
+    async def _embed(self, texts: list[str]) -> list[list[float]]:
+        async with self._embed_semaphore:
+
+            async def call():
+                await self.request_bucket.acquire()
+                await self.token_bucket.acquire(_estimate_tokens(texts))
+                with stage("embed"):
+                    return await self.embeddings.aembed_documents(texts)
+
+            return await self._with_backoff(
+                "Embedding", call, (self.request_bucket, self.token_bucket)
+            )
+
+    async def _upsert(self, texts, vectors, metadatas, ids) -> list[str]:
+        async with self._upsert_semaphore:
+            return await self._with_backoff(
+                "Upsert", lambda: self.upsert(texts, vectors, metadatas, ids)
+            )
+
+    async def _process(self, batch: list[Document]) -> int:
+        texts = [doc.page_content for doc in batch]
+        ids = [doc.id for doc in batch]
+        vectors = await self._embed(texts)
+        metadatas = [doc.metadata for doc in batch]
+        await self._upsert(texts, vectors, metadatas, ids if all(ids) else None)
+        return len(batch)
+
+    async def _batches(
+        self, docs: Union[Iterable[Document], AsyncIterable[Document]]
+    ) -> AsyncIterable[list[Document]]:
+        batch = []
+        if hasattr(docs, "__aiter__"):
+            async for doc in docs:
+                batch.append(doc)
+                if len(batch) == self.batch_size:
+                    yield batch
+                    batch = []
+        else:
+            for doc in docs:
+                batch.append(doc)
+                if len(batch) == self.batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    async def run(
+        self,
+        docs: Union[Iterable[Document], AsyncIterable[Document]],
+        progress: Optional[ProgressCallback] = None,
+        total: Optional[int] = None,
+    ) -> int:
+        """
+        Embed and upsert every document.
+
+        :param docs: The chunks to ingest, as a (async) iterable
+        :param progress: Called with the number of upserted chunks
+        :param total: The number of chunks, if known
+        :return: The number of upserted chunks
+        """
+        # Bound the batches held in memory to what can be in flight.
+        in_flight = asyncio.Semaphore(self.embed_concurrency + self.upsert_concurrency)
+        # Progress callbacks may share a DB session, so never run them concurrently.
+        progress_lock = asyncio.Lock()
+        tasks: set[asyncio.Task] = set()
+        processed = 0
+
+        async def process(batch: list[Document]) -> None:
+            nonlocal processed
+            try:
+                count = await self._process(batch)
+                processed += count
+            finally:
+                in_flight.release()
+            if progress:
+                async with progress_lock:
+                    await progress("embedding", processed, total)
+
+        try:
+            async for batch in self._batches(docs):
+                await in_flight.acquire()
+                for task in [task for task in tasks if task.done()]:
+                    tasks.discard(task)
+                    task.result()
+                tasks.add(asyncio.create_task(process(batch)))
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        return processed
+
+
+def create_embedding_pipeline(embeddings: Embeddings, upsert: Upsert):
+    return EmbeddingPipeline(
+        embeddings,
+        upsert,
+        batch_size=settings.embedding_batch_size,
+        embed_concurrency=settings.embedding_concurrency,
+        upsert_concurrency=settings.upsert_concurrency,
+        requests_per_minute=settings.embedding_requests_per_minute,
+        tokens_per_minute=settings.embedding_tokens_per_minute,
+        max_retries=settings.embedding_max_retries,
+    )
@@ -0,0 +1,128 @@
+import logging
+from functools import lru_cache
+from typing import Optional
+
+import tiktoken
+from langchain.schema import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import Chat, Message
+from src.database.repository.chat import get_recent_messages
+from src.enums import Role
+from src.services.message_writer import message_writer
+from src.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Per-message overhead of the chat format, as counted by OpenAI.
+MESSAGE_TOKEN_OVERHEAD = 4
+
+
+@lru_cache(maxsize=1)
+def _encoding() -> Optional[tiktoken.Encoding]:
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        logger.warning("tiktoken encoding unavailable, estimating token counts")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    encoding = _encoding()
+    if encoding is None:
+        return text[: max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def message_tokens(message: Message) -> int:
+    return count_tokens(message.content) + MESSAGE_TOKEN_OVERHEAD
+
+
+def to_langchain_message(message: Message) -> Optional[BaseMessage]:
+    if message.role == Role.HUMAN:
+        return HumanMessage(content=message.content)
+    if message.role == Role.AI:
+        return AIMessage(content=message.content)
+    return None
+
+
+def summary_message(summary: str) -> SystemMessage:
+    return SystemMessage(content=f"Summary of the earlier conversation: {summary}")
+
+
+def history_budget(chat: Chat) -> int:
+    """
+    The tokens left for recent messages once the chat summary is counted.
+    """
+    budget = settings.history_token_budget
+    if chat.summary:
+        budget -= count_tokens(summary_message(chat.summary).content)
+        budget -= MESSAGE_TOKEN_OVERHEAD
+    return max(budget, 0)
+
+
+async def load_recent_messages(
+    db: AsyncSession, chat: Chat, token_budget: Optional[int] = None
+) -> tuple[list[Message], bool]:
+    """
+    Load the newest messages not yet folded into the chat summary that fit in
+    the token budget, by default what the summary leaves of the history budget.
+
+    :return: The messages, oldest first, and whether older unsummarized
+        messages were left out
+    """
+    if token_budget is None:
+        token_budget = history_budget(chat)
+    await message_writer.wait_for_chat(chat.id)
+    candidates = await get_recent_messages(
+        db, chat.id, chat.summarized_until_id, settings.history_max_messages
+    )
+    messages = []
+    used = 0
+    for message in candidates:
+        used += message_tokens(message)
+        if used > token_budget:
+            return messages[::-1], True
+        messages.append(message)
+    truncated = len(candidates) == settings.history_max_messages
+    return messages[::-1], truncated
+
+
+async def load_chat_context(
+    db: AsyncSession, chat: Chat, question: Optional[str] = None
+) -> list[BaseMessage]:
+    """
+    Build the chat history passed to the LLM: the rolling summary of older
+    turns followed by the recent messages that fit the token budget. The
+    summary counts against the budget, so the history never exceeds it.
+
+    :param db: The database session
+    :param chat: The chat
+    :param question: The current question if it is not saved yet; it ends
+        the history and counts against the token budget as if it were
+    :return: The history as LangChain messages
+    """
+    token_budget = history_budget(chat)
+    if question is not None:
+        token_budget = max(token_budget - count_tokens(question), 0)
+    messages, _ = await load_recent_messages(db, chat, token_budget)
+    history = []
+    if chat.summary:
+        history.append(summary_message(chat.summary))
+    for message in messages:
+        converted = to_langchain_message(message)
+        if converted is not None:
+            history.append(converted)
+    if question is not None:
+        history.append(HumanMessage(content=question))
+    return history
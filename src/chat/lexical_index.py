@@ -0,0 +1,393 @@
+import asyncio
+import math
+import os
+import re
+import threading
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from src.services.cache import LRUCache
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60
+
+# Words, numbers and identifiers such as "4.2.1", "AB-1234" or "s/n".
+TOKEN_PATTERN = re.compile(r"\w+(?:[.\-/]\w+)*")
+SEPARATORS = re.compile(r"[.\-/]")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it of on or "
+    "that the this to was what when where which who why with".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Lowercase terms of a text. Compound identifiers are indexed both whole
+    and by their parts, so "4.2" matches "section 4.2" as well as "4".
+    """
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(token)
+        if SEPARATORS.search(token):
+            tokens.extend(part for part in SEPARATORS.split(token) if part)
+    return tokens
+
+
+@dataclass
+class LexicalMatches:
+    """
+    BM25 results for a query. ``coverage`` is the share of the query's IDF
+    weight matched by the top chunk, ``margin`` the ratio of its score to the
+    median score of the other matching chunks (infinite when no other chunk
+    matches); together they say how clearly the query singles out a few
+    chunks of the document.
+    """
+
+    chunks: list[int]
+    scores: list[float]
+    coverage: float
+    margin: float
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index of one document's chunks, loaded from disk.
+    """
+
+    def __init__(self, index_path: Path, texts_path: Path):
+        with np.load(index_path) as data:
+            vocabulary = data["vocabulary"].tobytes().decode("utf-8")
+            self.terms = {term: i for i, term in enumerate(vocabulary.split("\n"))}
+            self.term_offsets = data["term_offsets"]
+            self.postings = data["postings"]
+            self.frequencies = data["frequencies"]
+            self.lengths = data["lengths"]
+            self.pages = data["pages"]
+            self.text_offsets = data["text_offsets"]
+        self.size = len(self.lengths)
+        self.average_length = float(self.lengths.mean()) if self.size else 0.0
+        self._texts = np.memmap(texts_path, dtype=np.uint8, mode="r")
+
+    def text(self, chunk: int) -> str:
+        start, end = self.text_offsets[chunk], self.text_offsets[chunk + 1]
+        return self._texts[start:end].tobytes().decode("utf-8")
+
+    def _idf(self, document_frequency: int) -> float:
+        return math.log(
+            1 + (self.size - document_frequency + 0.5) / (document_frequency + 0.5)
+        )
+
+    def search(self, query: str, k: int) -> LexicalMatches:
+        terms = set(tokenize(query)) - STOPWORDS or set(tokenize(query))
+        scores = np.zeros(self.size, dtype=np.float32)
+        matched_weight = np.zeros(self.size, dtype=np.float32)
+        total_weight = 0.0
+        for term in terms:
+            row = self.terms.get(term)
+            if row is None:
+                # Unknown terms weigh as much as the rarest known term.
+                total_weight += self._idf(0)
+                continue
+            start, end = self.term_offsets[row], self.term_offsets[row + 1]
+            chunks = self.postings[start:end]
+            frequencies = self.frequencies[start:end].astype(np.float32)
+            idf = self._idf(end - start)
+            norm = BM25_K1 * (
+                1 - BM25_B + BM25_B * self.lengths[chunks] / self.average_length
+            )
+            scores[chunks] += idf * frequencies * (BM25_K1 + 1) / (frequencies + norm)
+            matched_weight[chunks] += idf
+            total_weight += idf
+
+        candidates = np.flatnonzero(scores)
+        if not len(candidates):
+            return LexicalMatches([], [], 0.0, 0.0)
+        top = min(k, len(candidates))
+        best = candidates[np.argpartition(-scores[candidates], top - 1)[:top]]
+        best = best[np.argsort(-scores[best])]
+        # Chunks without any query term would make the median 0 for most
+        # queries, so only the other matching chunks are compared.
+        others = scores[candidates[candidates != best[0]]]
+        median = float(np.median(others)) if len(others) else 0.0
+        return LexicalMatches(
+            chunks=best.tolist(),
+            scores=scores[best].tolist(),
+            coverage=float(matched_weight[best[0]] / total_weight),
+            margin=float(scores[best[0]] / median) if median else math.inf,
+        )
+
+
+class LexicalIndexBuilder:
+    """
+    Builds a document's index from its chunks as they are produced. Texts
+    are streamed to disk; only the postings are held in memory. Nothing is
+    visible to readers until ``finish``.
+    """
+
+    def __init__(self, store: "LexicalIndexStore", document_id: int):
+        self.store = store
+        self.document_id = document_id
+        index_path, texts_path = store.paths(document_id)
+        self._index_tmp = index_path.with_suffix(".tmp.npz")
+        self._texts_tmp = texts_path.with_suffix(".tmp")
+        self._texts = self._texts_tmp.open("wb")
+        self._text_offsets = array("q", [0])
+        self._lengths = array("i")
+        self._pages = array("i")
+        self._postings: dict[str, tuple[array, array]] = {}
+
+    def add_chunks(self, chunks: list[tuple[int, str]]) -> None:
+        """
+        Add (page, text) chunks in order; tokenizes and writes, so run it in
+        an executor.
+        """
+        for page, text in chunks:
+            self.add(page, text)
+
+    def add(self, page: int, text: str) -> None:
+        chunk = len(self._lengths)
+        tokens = tokenize(text)
+        for term, frequency in Counter(tokens).items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array("i"), array("H"))
+            postings[0].append(chunk)
+            postings[1].append(min(frequency, 0xFFFF))
+        encoded = text.encode("utf-8")
+        self._texts.write(encoded)
+        self._text_offsets.append(self._text_offsets[-1] + len(encoded))
+        self._lengths.append(len(tokens))
+        self._pages.append(page)
+
+    def finish(self) -> None:
+        self._texts.close()
+        terms = sorted(self._postings)
+        term_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        term_offsets[1:] = np.cumsum([len(self._postings[t][0]) for t in terms])
+        postings = np.concatenate(
+            [np.frombuffer(self._postings[t][0], dtype=np.int32) for t in terms]
+            or [np.zeros(0, dtype=np.int32)]
+        )
+        frequencies = np.concatenate(
+            [np.frombuffer(self._postings[t][1], dtype=np.uint16) for t in terms]
+            or [np.zeros(0, dtype=np.uint16)]
+        )
+        with self._index_tmp.open("wb") as f:
+            np.savez_compressed(
+                f,
+                vocabulary=np.frombuffer("\n".join(terms).encode("utf-8"), np.uint8),
+                term_offsets=term_offsets,
+                postings=postings,
+                frequencies=frequencies,
+                lengths=np.frombuffer(self._lengths, dtype=np.int32),
+                pages=np.frombuffer(self._pages, dtype=np.int32),
+                text_offsets=np.frombuffer(self._text_offsets, dtype=np.int64),
+            )
+        index_path, texts_path = self.store.paths(self.document_id)
+        os.replace(self._texts_tmp, texts_path)
+        os.replace(self._index_tmp, index_path)
+        self.store.evict(self.document_id)
+
+    def abort(self) -> None:
+        self._texts.close()
+        self._texts_tmp.unlink(missing_ok=True)
+        self._index_tmp.unlink(missing_ok=True)
+
+
+class LexicalIndexStore:
+    """
+    Per-document BM25 indexes on local disk: ``{document_id}.bm25.npz``
+    holds the vocabulary, postings (chunk, term frequency) in CSR layout and
+    chunk lengths and pages; ``{document_id}.chunks`` holds the chunk texts
+    back to back. Recently used indexes are kept loaded.
+    """
+
+    def __init__(self, directory: str, max_loaded: int = 64):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._loaded: LRUCache[LexicalIndex] = LRUCache(max_loaded)
+        self._lock = threading.Lock()
+
+    def paths(self, document_id: int) -> tuple[Path, Path]:
+        return (
+            self.directory / f"{document_id}.bm25.npz",
+            self.directory / f"{document_id}.chunks",
+        )
+
+    def builder(self, document_id: int) -> LexicalIndexBuilder:
+        return LexicalIndexBuilder(self, document_id)
+
+    def load(self, document_id: int) -> Optional[LexicalIndex]:
+        index = self._loaded.get(document_id)
+        if index is not None:
+            return index
+        index_path, texts_path = self.paths(document_id)
+        with self._lock:
+            if not index_path.exists():
+                return None
+            index = LexicalIndex(index_path, texts_path)
+        self._loaded.set(document_id, index)
+        return index
+
+    def document_ids(self) -> list[int]:
+        """
+        :return: The IDs of every document with a stored index or chunk texts
+        """
+        ids = {path.name.split(".")[0] for path in self.directory.glob("*.bm25.npz")}
+        ids.update(path.stem for path in self.directory.glob("*.chunks"))
+        return sorted(int(id_) for id_ in ids if id_.isdigit())
+
+    def evict(self, document_id: int) -> None:
+        self._loaded.pop(document_id)
+
+    def delete(self, document_id: int) -> None:
+        self.evict(document_id)
+        for path in self.paths(document_id):
+            path.unlink(missing_ok=True)
+
+
+@dataclass
+class HybridStats:
+    """
+    How often hybrid retrieval answered from the lexical index alone and
+    skipped the query embedding.
+    """
+
+    lexical_only: int = 0
+    fused: int = 0
+
+    @property
+    def skip_rate(self) -> float:
+        total = self.lexical_only + self.fused
+        return self.lexical_only / total if total else 0.0
+
+
+def _to_documents(
+    document_id: int, index: LexicalIndex, matches: LexicalMatches
+) -> list[Document]:
+    documents = []
+    for chunk in matches.chunks:
+        text = index.text(chunk)
+        metadata = {
+            "document_id": document_id,
+            "page": int(index.pages[chunk]),
+            "text": text,
+        }
+        documents.append(Document(page_content=text, metadata=metadata))
+    return documents
+
+
+def reciprocal_rank_fusion(rankings: list[list[Document]], k: int) -> list[Document]:
+    """
+    Fuse rankings by summing 1 / (RRF_K + rank) per document, identifying
+    documents by their text.
+    """
+    scores: dict[str, float] = {}
+    documents: dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, document in enumerate(ranking):
+            key = document.page_content
+            scores[key] = scores.get(key, 0.0) + 1 / (RRF_K + rank + 1)
+            documents.setdefault(key, document)
+    fused = sorted(scores, key=scores.get, reverse=True)
+    return [documents[key] for key in fused[:k]]
+
+
+class BM25Retriever(BaseRetriever):
+    """
+    Retrieves a document's chunks by BM25 alone, without any embedding call.
+    """
+
+    store: LexicalIndexStore
+    document_id: int
+    k: int = 4
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        index = self.store.load(self.document_id)
+        if index is None:
+            return []
+        return _to_documents(self.document_id, index, index.search(query, self.k))
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Fuses BM25 and vector search with reciprocal-rank fusion. When the top
+    chunk covers at least ``min_coverage`` of the query's term weight and
+    scores ``min_margin`` times the median of the other matching chunks, the
+    BM25 results are returned as they are and the query is never embedded.
+    Documents without a lexical index fall back to vector search.
+    """
+
+    store: LexicalIndexStore
+    vector_retriever: BaseRetriever
+    document_id: int
+    stats: HybridStats
+    k: int = 4
+    min_coverage: float = 0.9
+    min_margin: float = 1.5
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _confident(self, matches: LexicalMatches) -> bool:
+        return (
+            bool(matches.chunks)
+            and matches.coverage >= self.min_coverage
+            and matches.margin >= self.min_margin
+        )
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        index = self.store.load(self.document_id)
+        if index is None:
+            return self.vector_retriever.invoke(
+                query, {"callbacks": run_manager.get_child()}
+            )
+        matches = index.search(query, self.k)
+        lexical = _to_documents(self.document_id, index, matches)
+        if self._confident(matches):
+            self.stats.lexical_only += 1
+            return lexical
+        self.stats.fused += 1
+        vector = self.vector_retriever.invoke(
+            query, {"callbacks": run_manager.get_child()}
+        )
+        return reciprocal_rank_fusion([lexical, vector], self.k)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        loop = asyncio.get_running_loop()
+        index = await loop.run_in_executor(None, self.store.load, self.document_id)
+        if index is None:
+            return await self.vector_retriever.ainvoke(
+                query, {"callbacks": run_manager.get_child()}
+            )
+        matches = index.search(query, self.k)
+        lexical = _to_documents(self.document_id, index, matches)
+        if self._confident(matches):
+            self.stats.lexical_only += 1
+            return lexical
+        self.stats.fused += 1
+        vector = await self.vector_retriever.ainvoke(
+            query, {"callbacks": run_manager.get_child()}
+        )
+        return reciprocal_rank_fusion([lexical, vector], self.k)
@@ -0,0 +1,380 @@
+import asyncio
+import json
+import os
+import threading
+import uuid
+from functools import partial
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from src.services.cache import LRUCache
+
+
+class _DocumentMatrix:
+    """
+    Memory-mapped view of one document's embeddings and the matching records.
+    """
+
+    def __init__(self, vectors: np.ndarray, records: list[dict], stamp: tuple):
+        self.vectors = vectors
+        self.records = records
+        # The sizes of the files it was read from.
+        self.stamp = stamp
+
+
+def _normalized(vectors: list[list[float]], indices: list[int]) -> np.ndarray:
+    matrix = np.asarray([vectors[i] for i in indices], dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.where(norms == 0, 1, norms)
+    return np.ascontiguousarray(matrix)
+
+
+def _read_records(path: Path, rows: int) -> list[dict]:
+    """
+    Read the current record of each of the first ``rows`` rows. A later line
+    for a row supersedes the earlier ones; the records end at the first row
+    without one or a line cut short by a crash.
+    """
+    records: dict[int, dict] = {}
+    if path.exists():
+        with path.open(encoding="utf-8") as f:
+            for line_number, line in enumerate(f):
+                if not line.endswith("\n"):
+                    break
+                record = json.loads(line)
+                # Lines written before rows were recorded are one per row.
+                records[record.get("row", line_number)] = record
+    result = []
+    for row in range(rows):
+        record = records.get(row)
+        if record is None:
+            break
+        result.append(record)
+    return result
+
+
+def _truncate(path: Path, size: int) -> None:
+    if path.exists() and path.stat().st_size > size:
+        with path.open("r+b") as f:
+            f.truncate(size)
+
+
+class LocalVectorStore(VectorStore):
+    """
+    Vector store that keeps every document's embeddings on local disk.
+
+    Each document gets a ``{document_id}.f32`` file holding a contiguous,
+    row-major float32 matrix of L2-normalised vectors, a ``{document_id}.dim``
+    file with the vector dimension and a ``{document_id}.jsonl`` log with a
+    record (row, id, text, metadata) per written row. Vectors are upserted
+    by ID: new IDs are appended, and a retried ingestion overwrites its
+    earlier rows in place and appends their new records instead of adding
+    duplicates. As in Pinecone, the text is the document's page content and
+    not repeated under the "text" metadata key. Files are read through
+    ``numpy.memmap``, so a top-k query for a document is a single
+    matrix-vector product; recently used documents are kept loaded.
+    """
+
+    def __init__(self, directory: str, embedding: Embeddings, max_loaded: int = 64):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._embedding = embedding
+        self._lock = threading.Lock()
+        self._cache: LRUCache[_DocumentMatrix] = LRUCache(max_loaded)
+        # The row of every stored vector ID of recently written documents.
+        self._rows: LRUCache[dict[str, int]] = LRUCache(max_loaded)
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: list[str],
+        embedding: Embeddings,
+        metadatas: Optional[list[dict]] = None,
+        directory: str = "storage/vectors",
+        **kwargs: Any,
+    ) -> "LocalVectorStore":
+        store = cls(directory, embedding)
+        store.add_texts(texts, metadatas, **kwargs)
+        return store
+
+    def _paths(self, document_id: int) -> tuple[Path, Path, Path]:
+        return (
+            self.directory / f"{document_id}.f32",
+            self.directory / f"{document_id}.jsonl",
+            self.directory / f"{document_id}.dim",
+        )
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[list[dict]] = None,
+        ids: Optional[list[str]] = None,
+        **kwargs: Any,
+    ) -> list[str]:
+        texts = list(texts)
+        vectors = self._embedding.embed_documents(texts)
+        return self.add_embeddings(texts, vectors, metadatas, ids)
+
+    async def aadd_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[list[dict]] = None,
+        ids: Optional[list[str]] = None,
+        **kwargs: Any,
+    ) -> list[str]:
+        texts = list(texts)
+        vectors = await self._embedding.aembed_documents(texts)
+        return self.add_embeddings(texts, vectors, metadatas, ids)
+
+    def add_embeddings(
+        self,
+        texts: list[str],
+        vectors: list[list[float]],
+        metadatas: Optional[list[dict]] = None,
+        ids: Optional[list[str]] = None,
+    ) -> list[str]:
+        """
+        Upsert precomputed embeddings, grouped by their ``document_id``
+        metadata. Vectors with a stored ID replace it; the others are appended.
+
+        :return: The IDs of the added vectors
+        """
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+
+        groups: dict[int, list[int]] = {}
+        for i, metadata in enumerate(metadatas):
+            groups.setdefault(metadata.get("document_id", 0), []).append(i)
+
+        def record(row: int, i: int) -> str:
+            metadata = {
+                key: value for key, value in metadatas[i].items() if key != "text"
+            }
+            return json.dumps(
+                {"row": row, "id": ids[i], "text": texts[i], "metadata": metadata}
+            )
+
+        with self._lock:
+            for document_id, rows in groups.items():
+                vectors_path, records_path, dim_path = self._paths(document_id)
+                dim = len(vectors[rows[0]])
+                stored_dim = self._dimension(document_id)
+                if stored_dim is not None and stored_dim != dim:
+                    raise ValueError(
+                        f"Document {document_id} stores {stored_dim}-dimensional "
+                        f"vectors, got {dim}"
+                    )
+                if not dim_path.exists():
+                    dim_path.write_text(str(dim))
+                stored = self._stored_rows(document_id)
+                # The last occurrence of an ID repeated in one call wins.
+                latest = {ids[i]: i for i in rows}
+                appended = [i for id_, i in latest.items() if id_ not in stored]
+                replaced = {
+                    stored[id_]: i for id_, i in latest.items() if id_ in stored
+                }
+                try:
+                    # Vectors are written before their records, so a crash
+                    # leaves at most vectors without records, which the next
+                    # write drops.
+                    if appended:
+                        with vectors_path.open("ab") as f:
+                            f.write(_normalized(vectors, appended).tobytes())
+                    if replaced:
+                        matrix = _normalized(vectors, list(replaced.values()))
+                        with vectors_path.open("r+b") as f:
+                            for row, vector in zip(replaced, matrix):
+                                f.seek(row * vector.nbytes)
+                                f.write(vector.tobytes())
+                    with records_path.open("a", encoding="utf-8") as f:
+                        for i in appended:
+                            stored[ids[i]] = len(stored)
+                            f.write(record(stored[ids[i]], i) + "\n")
+                        for row, i in replaced.items():
+                            f.write(record(row, i) + "\n")
+                except BaseException:
+                    self._rows.pop(document_id)
+                    raise
+                finally:
+                    self._cache.pop(document_id)
+        return ids
+
+    def _dimension(self, document_id: int) -> Optional[int]:
+        vectors_path, records_path, dim_path = self._paths(document_id)
+        if dim_path.exists():
+            return int(dim_path.read_text())
+        # Documents stored before the dimension was recorded.
+        if vectors_path.exists() and records_path.exists():
+            with records_path.open(encoding="utf-8") as f:
+                count = sum(1 for _ in f)
+            if count:
+                return vectors_path.stat().st_size // (4 * count)
+        return None
+
+    def _stored_rows(self, document_id: int) -> dict[str, int]:
+        # Called with the lock held, after the dimension file was written.
+        rows = self._rows.get(document_id)
+        if rows is None:
+            vectors_path, records_path, _ = self._paths(document_id)
+            row_bytes = 4 * self._dimension(document_id)
+            size = vectors_path.stat().st_size if vectors_path.exists() else 0
+            records = _read_records(records_path, size // row_bytes)
+            rows = {record["id"]: row for row, record in enumerate(records)}
+            # Drop what a crashed write left behind: vectors without records
+            # and a partly written record line.
+            _truncate(vectors_path, len(rows) * row_bytes)
+            if records_path.exists() and records_path.stat().st_size:
+                with records_path.open("rb") as f:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        f.seek(0)
+                        _truncate(records_path, f.read().rfind(b"\n") + 1)
+            self._rows.set(document_id, rows)
+        return rows
+
+    def _load(self, document_id: int) -> Optional[_DocumentMatrix]:
+        vectors_path, records_path, _ = self._paths(document_id)
+        with self._lock:
+            cached = self._cache.get(document_id)
+            if not vectors_path.exists():
+                self._cache.pop(document_id)
+                return None
+            stamp = (
+                vectors_path.stat().st_size,
+                records_path.stat().st_size if records_path.exists() else 0,
+            )
+            if cached is not None and cached.stamp == stamp:
+                return cached
+            dim = self._dimension(document_id)
+            if not dim:
+                return None
+            records = _read_records(records_path, stamp[0] // (4 * dim))
+            if not records:
+                return None
+            vectors = np.memmap(
+                vectors_path, dtype=np.float32, mode="r", shape=(len(records), dim)
+            )
+            matrix = _DocumentMatrix(vectors, records, stamp)
+            self._cache.set(document_id, matrix)
+            return matrix
+
+    def document_ids(self) -> list[int]:
+        """
+        :return: The IDs of every document with stored vectors
+        """
+        paths = [*self.directory.glob("*.f32"), *self.directory.glob("*.dim")]
+        return sorted({int(path.stem) for path in paths})
+
+    def _document_ids(self, filter: Optional[dict]) -> list[int]:
+        if filter and "document_id" in filter:
+            value = filter["document_id"]
+            if isinstance(value, dict):
+                value = value.get("$eq")
+            return [int(value)]
+        return self.document_ids()
+
+    def similarity_search_by_vector_with_score(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        filter: Optional[dict] = None,
+    ) -> list[tuple[Document, float]]:
+        query = np.asarray(embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+
+        candidates: list[tuple[Document, float]] = []
+        for document_id in self._document_ids(filter):
+            matrix = self._load(document_id)
+            if matrix is None:
+                continue
+            scores = matrix.vectors @ query
+            top = min(k, len(scores))
+            indices = np.argpartition(-scores, top - 1)[:top]
+            for i in indices[np.argsort(-scores[indices])]:
+                record = matrix.records[i]
+                document = Document(
+                    page_content=record["text"], metadata=record["metadata"]
+                )
+                candidates.append((document, float(scores[i])))
+        candidates.sort(key=lambda pair: pair[1], reverse=True)
+        return candidates[:k]
+
+    def similarity_search_by_vector(
+        self, embedding: list[float], k: int = 4, **kwargs: Any
+    ) -> list[Document]:
+        results = self.similarity_search_by_vector_with_score(embedding, k, **kwargs)
+        return [document for document, _ in results]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> list[tuple[Document, float]]:
+        embedding = self._embedding.embed_query(query)
+        return self.similarity_search_by_vector_with_score(embedding, k, **kwargs)
+
+    def similarity_search(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> list[Document]:
+        return [
+            document
+            for document, _ in self.similarity_search_with_score(query, k, **kwargs)
+        ]
+
+    async def asimilarity_search(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> list[Document]:
+        embedding = await self._embedding.aembed_query(query)
+        # Loading a document that is not cached reads and parses its records.
+        return await asyncio.get_running_loop().run_in_executor(
+            None, partial(self.similarity_search_by_vector, embedding, k, **kwargs)
+        )
+
+    def _select_relevance_score_fn(self):
+        return lambda score: (score + 1.0) / 2.0
+
+    def delete_document(self, document_id: int) -> None:
+        """
+        Remove every vector stored for a document.
+
+        :param document_id: The document ID to delete
+        """
+        with self._lock:
+            self._cache.pop(document_id)
+            self._rows.pop(document_id)
+            for path in self._paths(document_id):
+                path.unlink(missing_ok=True)
+
+    def delete(self, ids: Optional[list[str]] = None, **kwargs: Any) -> Optional[bool]:
+        if "document_id" in kwargs:
+            self.delete_document(kwargs["document_id"])
+            return True
+        if not ids:
+            return False
+        ids_to_delete = set(ids)
+        for document_id in self._document_ids(None):
+            matrix = self._load(document_id)
+            if matrix is None:
+                continue
+            keep = [
+                i
+                for i, record in enumerate(matrix.records)
+                if record["id"] not in ids_to_delete
+            ]
+            if len(keep) == len(matrix.records):
+                continue
+            texts = [matrix.records[i]["text"] for i in keep]
+            metadatas = [matrix.records[i]["metadata"] for i in keep]
+            kept_ids = [matrix.records[i]["id"] for i in keep]
+            vectors = np.array(matrix.vectors[keep])
+            self.delete_document(document_id)
+            if keep:
+                self.add_embeddings(texts, vectors.tolist(), metadatas, kept_ids)
+        return True
@@ -0,0 +1,198 @@
+import asyncio
+import multiprocessing
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Iterator, Optional
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from pypdf import PdfReader
+
+from src.services.metrics import stage
+
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 100
+# Bump whenever a change to the splitting changes the chunks it produces.
+SPLITTER_VERSION = 2
+
+# (pages, lengths, text): the page number and length of every chunk as int32
+# arrays plus all chunk texts concatenated, so a whole page range crosses the
+# process boundary as three objects instead of one tuple per chunk.
+PackedChunks = tuple[bytes, bytes, str]
+
+
+def _text_splitter() -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP
+    )
+
+
+def iter_pdf_chunks(
+    document_path: str, start: int = 0, end: Optional[int] = None
+) -> Iterator[list[tuple[int, str]]]:
+    """
+    Extract and split the pages ``[start, end)`` of a PDF one page at a time.
+
+    The last chunk of each page is held back and split again together with
+    the next page, so chunks and their overlap continue across page
+    boundaries within the range. The range starts without a carried chunk
+    and emits its own last one, so its chunks never depend on the pages
+    outside it.
+
+    :param document_path: The path of the PDF
+    :param start: The first page to split
+    :param end: The page after the last one to split, defaults to the last page
+    :return: An iterator of (page, text) chunk lists, one list per page
+    """
+    text_splitter = _text_splitter()
+    reader = PdfReader(document_path)
+    end = len(reader.pages) if end is None else min(end, len(reader.pages))
+
+    carry, carry_page = "", start
+    for page_number in range(start, end):
+        text = reader.pages[page_number].extract_text()
+        if not text.strip():
+            continue
+        buffer = f"{carry}\n{text}" if carry else text
+        chunks = text_splitter.split_text(buffer)
+        page_chunks = []
+        offset = 0
+        for chunk in chunks[:-1]:
+            chunk_start = buffer.find(chunk, offset)
+            offset = max(chunk_start, 0) + 1
+            page = carry_page if chunk_start < len(carry) else page_number
+            page_chunks.append((page, chunk))
+        if page_chunks:
+            yield page_chunks
+        if buffer.find(chunks[-1], offset) >= len(carry):
+            carry_page = page_number
+        carry = chunks[-1]
+    if carry:
+        yield [(carry_page, carry)]
+
+
+def page_ranges(page_count: int, pages_per_range: int) -> list[tuple[int, int]]:
+    """
+    The ``[start, end)`` page ranges a document is split in. Chunks never
+    span two ranges, so the ranges are part of the chunking and not only of
+    how it is scheduled.
+    """
+    return [
+        (start, min(start + pages_per_range, page_count))
+        for start in range(0, page_count, pages_per_range)
+    ]
+
+
+def iter_document_chunks(
+    document_path: str, pages_per_range: int
+) -> Iterator[list[tuple[int, str]]]:
+    """
+    Split a whole PDF in this process, range by range, with the same
+    chunks as ``ParsingPool.stream_chunks``.
+
+    :param document_path: The path of the PDF
+    :param pages_per_range: The pages per range
+    :return: An iterator of (page, text) chunk lists
+    """
+    for start, end in page_ranges(count_pages(document_path), pages_per_range):
+        yield from iter_pdf_chunks(document_path, start, end)
+
+
+def count_pages(document_path: str) -> int:
+    return len(PdfReader(document_path).pages)
+
+
+def split_page_range(document_path: str, start: int, end: int) -> PackedChunks:
+    pages = array("i")
+    lengths = array("i")
+    texts = []
+    for page_chunks in iter_pdf_chunks(document_path, start, end):
+        for page, text in page_chunks:
+            pages.append(page)
+            lengths.append(len(text))
+            texts.append(text)
+    return pages.tobytes(), lengths.tobytes(), "".join(texts)
+
+
+def unpack_chunks(packed: PackedChunks) -> list[tuple[int, str]]:
+    pages, lengths, text = array("i"), array("i"), packed[2]
+    pages.frombytes(packed[0])
+    lengths.frombytes(packed[1])
+    chunks = []
+    offset = 0
+    for page, length in zip(pages, lengths):
+        chunks.append((page, text[offset : offset + length]))
+        offset += length
+    return chunks
+
+
+class ParsingPool:
+    """
+    App-wide process pool for CPU-bound PDF parsing and splitting, so that
+    pypdf never holds the GIL of the process serving requests. Large PDFs
+    are split into page ranges that are parsed in parallel.
+    """
+
+    def __init__(self, size: int, pages_per_task: int):
+        self.size = size
+        self.pages_per_task = pages_per_task
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def chunking(self) -> str:
+        """
+        Identifies the chunks this pool produces: the splitter version and
+        parameters, and the page ranges chunks never span.
+        """
+        return (
+            f"v{SPLITTER_VERSION}:size={CHUNK_SIZE}:overlap={CHUNK_OVERLAP}"
+            f":pages={self.pages_per_task}"
+        )
+
+    def start(self) -> None:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.size,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+
+    def stop(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    async def _submit(self, fn, *args):
+        # Scripts that never ran the app lifespan still get a pool.
+        self.start()
+        loop = asyncio.get_running_loop()
+        # Named after the worker function; split_page_range covers both
+        # parsing and splitting, which are interleaved page by page.
+        with stage(fn.__name__):
+            return await loop.run_in_executor(self._executor, fn, *args)
+
+    async def stream_chunks(
+        self, document_path: str
+    ) -> AsyncIterator[list[tuple[int, str]]]:
+        """
+        Parse and split a PDF in the pool, yielding each page range's chunks
+        in document order. At most ``size`` ranges are in flight at once.
+
+        :param document_path: The path of the PDF
+        :return: An async iterator of (page, text) chunk lists
+        """
+        page_count = await self._submit(count_pages, document_path)
+        ranges = deque(page_ranges(page_count, self.pages_per_task))
+        pending: deque[asyncio.Future] = deque()
+        try:
+            while ranges or pending:
+                while ranges and len(pending) < self.size:
+                    start, end = ranges.popleft()
+                    pending.append(
+                        asyncio.ensure_future(
+                            self._submit(split_page_range, document_path, start, end)
+                        )
+                    )
+                yield unpack_chunks(await pending.popleft())
+        finally:
+            for future in pending:
+                future.cancel()
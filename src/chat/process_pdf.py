@@ -1,26 +1,105 @@
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Awaitable, Callable, Optional
 
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
 
-from src.chat.vector_store import vector_store
+from src.chat.embedding_cache import FileChunkCache, file_sha256
+from src.chat.embedding_pipeline import create_embedding_pipeline
+from src.chat.parsing_pool import ParsingPool
+from src.chat.vector_store import (
+    aupsert_embeddings,
+    embeddings,
+    lexical_index,
+    vector_id,
+)
+from src.services.metrics import stage, timed
+from src.settings import settings
 
+ProgressCallback = Callable[[str, int, Optional[int]], Awaitable[None]]
 
-async def create_embeddings_for_pdf(document_id: int, document_path: str) -> None:
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
-    loader = PyPDFLoader(document_path)
+parsing_pool = ParsingPool(settings.parsing_pool_size, settings.parsing_pages_per_task)
+file_chunk_cache = FileChunkCache(
+    settings.embedding_cache_path,
+    settings.file_chunk_cache_max_entries,
+    parsing_pool.chunking,
+)
+embedding_pipeline = create_embedding_pipeline(embeddings, aupsert_embeddings)
 
+
+async def _noop_progress(stage: str, processed: int, total: Optional[int]) -> None:
+    pass
+
+
+async def _single(item):
+    yield item
+
+
+@timed("ingest")
+async def create_embeddings_for_pdf(
+    document_id: int,
+    document_path: str,
+    progress: Optional[ProgressCallback] = None,
+    file_hash: Optional[str] = None,
+) -> int:
+    """
+    Parse, split, embed and upsert a PDF, and build its BM25 index from the
+    same chunks.
+
+    :return: The number of vectors written, with IDs ``vector_id(document_id, i)``
+    """
+    progress = progress or _noop_progress
     loop = asyncio.get_running_loop()
-    with ThreadPoolExecutor() as pool:
-        docs = await loop.run_in_executor(
-            pool, lambda: loader.load_and_split(text_splitter)
-        )
-
-    for doc in docs:
-        doc.metadata = {
-            "document_id": document_id,
-            "page": doc.metadata["page"],
-            "text": doc.page_content,
-        }
-    await vector_store.aadd_documents(docs)
+
+    await progress("parsing", 0, None)
+    if file_hash is None:
+        file_hash = await loop.run_in_executor(None, file_sha256, document_path)
+    # A byte-identical file was split before: reuse its chunks, and the
+    # embedding cache will serve their vectors.
+    cached_chunks = await loop.run_in_executor(None, file_chunk_cache.get, file_hash)
+
+    # Chunks are remembered for the file cache only up to a size limit,
+    # so memory stays bounded for very large documents.
+    seen_chunks = [] if cached_chunks is None else None
+    seen_size = 0
+    chunk_count = 0
+    lexical_builder = await loop.run_in_executor(
+        None, lexical_index.builder, document_id
+    )
+
+    async def documents() -> AsyncIterator[Document]:
+        nonlocal seen_chunks, seen_size, chunk_count
+        if cached_chunks is not None:
+            pages = _single(cached_chunks)
+        else:
+            pages = parsing_pool.stream_chunks(document_path)
+        async for page_chunks in pages:
+            await loop.run_in_executor(None, lexical_builder.add_chunks, page_chunks)
+            for page, text in page_chunks:
+                if seen_chunks is not None:
+                    seen_chunks.append((page, text))
+                    seen_size += len(text)
+                    if seen_size > settings.file_chunk_cache_max_chars:
+                        seen_chunks = None
+                yield Document(
+                    id=vector_id(document_id, chunk_count),
+                    page_content=text,
+                    metadata={
+                        "document_id": document_id,
+                        "page": page,
+                        "text": text,
+                    },
+                )
+                chunk_count += 1
+
+    total = len(cached_chunks) if cached_chunks is not None else None
+    try:
+        await embedding_pipeline.run(documents(), progress, total=total)
+        with stage("lexical_index"):
+            await loop.run_in_executor(None, lexical_builder.finish)
+    except BaseException:
+        lexical_builder.abort()
+        raise
+
+    if seen_chunks is not None:
+        await loop.run_in_executor(None, file_chunk_cache.set, file_hash, seen_chunks)
+    return chunk_count
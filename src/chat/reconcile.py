@@ -0,0 +1,138 @@
+"""
+Delete vectors and lexical indexes of documents that no longer exist.
+
+Usage:
+    python -m src.chat.reconcile [--dry-run]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+from typing import Optional
+
+from src.chat.vector_store import (
+    LocalVectorStore,
+    delete_vector_ids,
+    lexical_index,
+    parse_vector_id,
+    pc,
+    vector_store,
+)
+from src.database.db import async_session
+from src.database.repository.documents import get_document_vector_counts
+
+logger = logging.getLogger(__name__)
+
+
+def find_orphan_ids(
+    ids: list[str], vector_counts: dict[int, Optional[int]]
+) -> tuple[list[str], int]:
+    """
+    Select the IDs whose document no longer exists or whose chunk index is
+    beyond the document's recorded vector count.
+
+    :return: The orphan IDs and the number of IDs not following the scheme
+    """
+    orphans = []
+    unknown = 0
+    for id_ in ids:
+        parsed = parse_vector_id(id_)
+        if parsed is None:
+            unknown += 1
+            continue
+        document_id, chunk_index = parsed
+        if document_id not in vector_counts:
+            orphans.append(id_)
+            continue
+        vector_count = vector_counts[document_id]
+        if vector_count is not None and chunk_index >= vector_count:
+            orphans.append(id_)
+    return orphans, unknown
+
+
+async def _vector_counts() -> dict[int, Optional[int]]:
+    # Read only after listing the stores: a document's row is committed before
+    # its vectors or lexical index are written, so every document whose data
+    # was listed is in the result, even if it was created during the scan.
+    async with async_session() as db:
+        return await get_document_vector_counts(db)
+
+
+async def reconcile_lexical_index(dry_run: bool = False) -> int:
+    """
+    Delete lexical indexes of documents that no longer exist.
+
+    :param dry_run: Only report what would be deleted
+    :return: The number of orphaned lexical indexes found
+    """
+    loop = asyncio.get_running_loop()
+    document_ids = await loop.run_in_executor(None, lexical_index.document_ids)
+    vector_counts = await _vector_counts()
+    orphans = [
+        document_id for document_id in document_ids if document_id not in vector_counts
+    ]
+    logger.info("Found %d orphaned lexical indexes", len(orphans))
+    if not dry_run:
+        for document_id in orphans:
+            await loop.run_in_executor(None, lexical_index.delete, document_id)
+    return len(orphans)
+
+
+async def reconcile_vectors(dry_run: bool = False) -> int:
+    """
+    Delete orphaned vectors from the configured vector store.
+
+    :param dry_run: Only report what would be deleted
+    :return: The number of orphaned vectors (or local documents) found
+    """
+    loop = asyncio.get_running_loop()
+    if isinstance(vector_store, LocalVectorStore):
+        document_ids = await loop.run_in_executor(None, vector_store.document_ids)
+        vector_counts = await _vector_counts()
+        orphan_documents = [
+            document_id
+            for document_id in document_ids
+            if document_id not in vector_counts
+        ]
+        logger.info("Found %d orphaned local documents", len(orphan_documents))
+        if not dry_run:
+            for document_id in orphan_documents:
+                await loop.run_in_executor(
+                    None, vector_store.delete_document, document_id
+                )
+        return len(orphan_documents)
+
+    index = pc.Index(os.getenv("PINECONE_INDEX_NAME"))
+    ids = await loop.run_in_executor(
+        None, lambda: [id_ for page in index.list() for id_ in page]
+    )
+    orphans, unknown = find_orphan_ids(ids, await _vector_counts())
+    logger.info(
+        "Scanned %d vectors: %d orphaned, %d with legacy IDs left untouched",
+        len(ids),
+        len(orphans),
+        unknown,
+    )
+    if orphans and not dry_run:
+        await delete_vector_ids(index, orphans)
+    return len(orphans)
+
+
+async def reconcile(dry_run: bool = False) -> int:
+    """
+    Delete orphaned vectors and lexical indexes.
+
+    :param dry_run: Only report what would be deleted
+    :return: The number of orphaned vectors (or local documents) and lexical
+        indexes found
+    """
+    return await reconcile_vectors(dry_run) + await reconcile_lexical_index(dry_run)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(reconcile(args.dry_run))
@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Optional
+
+from langchain.schema import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import Runnable
+
+from src.chat.chains import get_rag_chain, update_chat_summary
+from src.chat.history import (
+    MESSAGE_TOKEN_OVERHEAD,
+    count_tokens,
+    load_chat_context,
+    summary_message,
+)
+from src.database.db import async_session
+from src.database.models import Chat
+from src.database.repository.chat import get_chat_by_id
+from src.services.message_writer import message_writer
+from src.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Summary refreshes outlive the connection that started them.
+_background_tasks: set[asyncio.Task] = set()
+
+
+def _tokens(message: BaseMessage) -> int:
+    return count_tokens(message.content) + MESSAGE_TOKEN_OVERHEAD
+
+
+class ChatSession:
+    """
+    Conversation state of a chat held for the life of a WebSocket: the RAG
+    chain, the rolling summary and the recent messages. The messages kept
+    are bounded by the history token budget and message limit, like the
+    history loaded per HTTP request, so memory per connection stays
+    bounded however long the conversation runs. When messages fall out of
+    the window, the chat summary is refreshed in the background and picked
+    up for the following turns.
+    """
+
+    active = 0
+    # Open sessions per chat, so that deleting a chat ends them.
+    _open: dict[int, set["ChatSession"]] = {}
+
+    def __init__(
+        self,
+        chat: Chat,
+        chain: Runnable,
+        history: list[BaseMessage],
+        token_budget: int = settings.history_token_budget,
+        max_messages: int = settings.history_max_messages,
+    ):
+        self.chat_id = chat.id
+        self.chain = chain
+        self.token_budget = token_budget
+        self.max_messages = max_messages
+        self.summary: Optional[SystemMessage] = None
+        self.summary_tokens = 0
+        if history and isinstance(history[0], SystemMessage):
+            self._set_summary(history[0])
+            history = history[1:]
+        self.messages: deque[BaseMessage] = deque(history)
+        self.tokens = sum(_tokens(message) for message in self.messages)
+        self._summarizing: Optional[asyncio.Task] = None
+        self.deleted = False
+        self.checked_at = time.monotonic()
+        # The message writer's future for the last turn.
+        self.last_save: Optional[asyncio.Future] = None
+
+    @classmethod
+    async def open(cls, chat: Chat) -> "ChatSession":
+        async with async_session() as db:
+            history = await load_chat_context(db, chat)
+        return cls(chat, get_rag_chain(chat.document_id), history)
+
+    def _set_summary(self, summary: SystemMessage) -> None:
+        # The summary counts against the token budget, as in load_chat_context.
+        self.summary = summary
+        self.summary_tokens = _tokens(summary)
+
+    def __enter__(self):
+        ChatSession.active += 1
+        ChatSession._open.setdefault(self.chat_id, set()).add(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        ChatSession.active -= 1
+        sessions = ChatSession._open.get(self.chat_id)
+        if sessions is not None:
+            sessions.discard(self)
+            if not sessions:
+                del ChatSession._open[self.chat_id]
+        return False
+
+    @classmethod
+    def chat_deleted(cls, chat_id: int) -> None:
+        """
+        Mark the chat's open sessions in this process as deleted.
+        """
+        for session in cls._open.get(chat_id, ()):
+            session.deleted = True
+
+    def save_failed(self) -> bool:
+        return (
+            self.last_save is not None
+            and self.last_save.done()
+            and not self.last_save.result()
+        )
+
+    async def chat_exists(self) -> bool:
+        """
+        Whether the chat still exists. Deletions in this process are seen at
+        once; otherwise the chat is looked up again after
+        ``settings.ws_chat_recheck_interval`` seconds or a failed save.
+        """
+        if self.deleted:
+            return False
+        recheck = time.monotonic() - self.checked_at > settings.ws_chat_recheck_interval
+        if recheck or self.save_failed():
+            async with async_session() as db:
+                self.deleted = await get_chat_by_id(db, self.chat_id) is None
+            self.checked_at = time.monotonic()
+        return not self.deleted
+
+    def context(self, question: str) -> list[BaseMessage]:
+        """
+        The chat history for a question: the summary, the most recent
+        messages that fit the token budget together with the question, and
+        the question itself.
+        """
+        budget = (
+            self.token_budget
+            - self.summary_tokens
+            - count_tokens(question)
+            - MESSAGE_TOKEN_OVERHEAD
+        )
+        recent = []
+        used = 0
+        for message in reversed(self.messages):
+            used += _tokens(message)
+            if used > budget:
+                break
+            recent.append(message)
+        head = [self.summary] if self.summary is not None else []
+        return head + recent[::-1] + [HumanMessage(content=question)]
+
+    def add_turn(self, question: str, answer: str) -> None:
+        for message in (HumanMessage(content=question), AIMessage(content=answer)):
+            self.messages.append(message)
+            self.tokens += _tokens(message)
+        trimmed = False
+        budget = self.token_budget - self.summary_tokens
+        while self.messages and (
+            self.tokens > budget or len(self.messages) > self.max_messages
+        ):
+            self.tokens -= _tokens(self.messages.popleft())
+            trimmed = True
+        if trimmed and self._summarizing is None:
+            self._summarizing = asyncio.create_task(self._refresh_summary())
+            _background_tasks.add(self._summarizing)
+            self._summarizing.add_done_callback(_background_tasks.discard)
+
+    async def _refresh_summary(self) -> None:
+        try:
+            await message_writer.wait_for_chat(self.chat_id)
+            await update_chat_summary(self.chat_id)
+            async with async_session() as db:
+                chat = await get_chat_by_id(db, self.chat_id)
+            if chat is not None and chat.summary:
+                self._set_summary(summary_message(chat.summary))
+        except Exception:
+            logger.exception("Failed to refresh the summary of chat %s", self.chat_id)
+        finally:
+            self._summarizing = None
@@ -0,0 +1,124 @@
+import asyncio
+import re
+from dataclasses import dataclass
+
+from langchain_core.documents import Document
+from langchain_core.language_models import BaseLanguageModel
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import BasePromptTemplate
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables import Runnable, RunnableLambda
+from langchain_core.runnables.config import merge_configs
+
+
+@dataclass
+class SpeculationStats:
+    """
+    How often retrieval on the raw input paid off. ``kept`` turns used the
+    speculative results as they were and skipped the second search;
+    ``merged`` turns searched again with the rewritten question and merged
+    both result sets.
+    """
+
+    kept: int = 0
+    merged: int = 0
+
+    @property
+    def total(self) -> int:
+        return self.kept + self.merged
+
+    @property
+    def payoff_rate(self) -> float:
+        return self.kept / self.total if self.total else 0.0
+
+
+def _words(text: str) -> set[str]:
+    return set(re.findall(r"\w+", text.lower()))
+
+
+def question_similarity(a: str, b: str) -> float:
+    """
+    Jaccard similarity of the words of two questions.
+    """
+    words_a, words_b = _words(a), _words(b)
+    if not words_a and not words_b:
+        return 1.0
+    return len(words_a & words_b) / len(words_a | words_b)
+
+
+def _document_key(document: Document):
+    return document.id or (document.metadata.get("page"), document.page_content)
+
+
+def interleave(primary: list[Document], secondary: list[Document]) -> list[Document]:
+    """
+    Merge two rankings by alternating between them, dropping duplicates,
+    and keep as many documents as the longer ranking.
+    """
+    merged, seen = [], set()
+    for pair in zip(primary, secondary):
+        for document in pair:
+            if _document_key(document) not in seen:
+                seen.add(_document_key(document))
+                merged.append(document)
+    longer = primary if len(primary) >= len(secondary) else secondary
+    for document in longer[min(len(primary), len(secondary)) :]:
+        if _document_key(document) not in seen:
+            seen.add(_document_key(document))
+            merged.append(document)
+    return merged[: len(longer)]
+
+
+def create_speculative_history_aware_retriever(
+    llm: BaseLanguageModel,
+    retriever: BaseRetriever,
+    prompt: BasePromptTemplate,
+    stats: SpeculationStats,
+    threshold: float,
+) -> Runnable:
+    """
+    Drop-in replacement for ``create_history_aware_retriever`` that starts
+    the vector search on the raw input while the LLM rewrites the question.
+    If the rewrite is effectively unchanged (word similarity of at least
+    ``threshold``), the speculative results are used as they are; otherwise
+    the rewritten question is searched too and both rankings are merged.
+
+    :param llm: The model rewriting the question
+    :param retriever: The retriever to search with
+    :param prompt: The rewrite prompt, taking "input" and "chat_history"
+    :param stats: Counters of kept and merged speculations
+    :param threshold: The word similarity at which a rewrite counts as unchanged
+    :return: A runnable mapping the chain input to the retrieved documents
+    """
+    rewrite = prompt | llm | StrOutputParser()
+
+    def retrieve(x: dict, config) -> list[Document]:
+        if not x.get("chat_history"):
+            return retriever.invoke(x["input"], config)
+        return retriever.invoke(rewrite.invoke(x, config), config)
+
+    async def aretrieve(x: dict, config) -> list[Document]:
+        if not x.get("chat_history"):
+            return await retriever.ainvoke(x["input"], config)
+        # Tagged as its own stage: it overlaps the rewrite and the second
+        # search, so adding it to "retrieval" would overstate that stage.
+        speculative_config = merge_configs(
+            config, {"tags": ["stage:speculative_retrieval"]}
+        )
+        speculative = asyncio.create_task(
+            retriever.ainvoke(x["input"], speculative_config)
+        )
+        try:
+            question = await rewrite.ainvoke(x, config)
+            if question_similarity(question, x["input"]) >= threshold:
+                stats.kept += 1
+                return await speculative
+            rewritten = await retriever.ainvoke(question, config)
+            stats.merged += 1
+            return interleave(rewritten, await speculative)
+        finally:
+            speculative.cancel()
+
+    return RunnableLambda(retrieve, afunc=aretrieve).with_config(
+        run_name="chat_retriever_chain"
+    )
@@ -1,61 +1,220 @@
 import asyncio
 import os
+import uuid
+from typing import Optional
 
 from dotenv import load_dotenv
+from langchain_core.vectorstores import VectorStore
 from langchain_openai.embeddings import OpenAIEmbeddings
 from langchain_pinecone import PineconeVectorStore
 import pinecone
 
+from src.chat.embedding_cache import cached_embeddings
+from src.chat.lexical_index import (
+    BM25Retriever,
+    HybridRetriever,
+    HybridStats,
+    LexicalIndexStore,
+)
+from src.chat.local_vector_store import LocalVectorStore
+from src.services.metrics import timed
 from src.settings import settings
 
 load_dotenv()
 
 embeddings = OpenAIEmbeddings()
+if settings.embedding_cache_enabled:
+    embeddings = cached_embeddings(
+        embeddings,
+        settings.embedding_cache_path,
+        settings.embedding_cache_max_entries,
+    )
 
-pc = pinecone.Pinecone(
-    api_key=os.getenv("PINECONE_API_KEY"),
-    environment=os.getenv("PINECONE_ENV_NAME"),
-)
 
-vector_store = PineconeVectorStore.from_existing_index(
-    os.getenv("PINECONE_INDEX_NAME"), embeddings
-)
+def create_vector_store() -> VectorStore:
+    """
+    Create the vector store selected by ``settings.vector_store_backend``.
+
+    :return: A LocalVectorStore for "local", otherwise a PineconeVectorStore
+    """
+    if settings.vector_store_backend == "local":
+        return LocalVectorStore(settings.local_vector_store_path, embeddings)
+    return PineconeVectorStore.from_existing_index(
+        os.getenv("PINECONE_INDEX_NAME"), embeddings
+    )
+
+
+vector_store = create_vector_store()
+lexical_index = LexicalIndexStore(settings.lexical_index_path)
+hybrid_stats = HybridStats()
+
+DELETE_BATCH_SIZE = 1000
+
+pc = None
+if isinstance(vector_store, PineconeVectorStore):
+    pc = pinecone.Pinecone(
+        api_key=os.getenv("PINECONE_API_KEY"),
+        environment=os.getenv("PINECONE_ENV_NAME"),
+    )
 
 
 def build_retriever(document_id):
     """
-    Build a retriever object using the PineconeVectorStore
+    Build a retriever object for ``settings.retrieval_mode``: "vector" uses
+    the configured vector store, "bm25" the document's lexical index and
+    "hybrid" fuses both, skipping the query embedding when BM25 is confident
 
     :return: A retriever object
     """
-    search_kwargs = {"filter": {"document_id": document_id}}
-    return vector_store.as_retriever(search_kwargs=search_kwargs)
+    search_kwargs = {"filter": {"document_id": document_id}, "k": settings.retrieval_k}
+    vector_retriever = vector_store.as_retriever(search_kwargs=search_kwargs)
+    if settings.retrieval_mode == "bm25":
+        return BM25Retriever(
+            store=lexical_index, document_id=document_id, k=settings.retrieval_k
+        )
+    if settings.retrieval_mode == "hybrid":
+        return HybridRetriever(
+            store=lexical_index,
+            vector_retriever=vector_retriever,
+            document_id=document_id,
+            stats=hybrid_stats,
+            k=settings.retrieval_k,
+            min_coverage=settings.lexical_min_coverage,
+            min_margin=settings.lexical_min_margin,
+        )
+    return vector_retriever
 
 
-def delete_document(document_id):
+def upsert_embeddings(
+    texts: list[str],
+    vectors: list[list[float]],
+    metadatas: list[dict],
+    ids: Optional[list[str]] = None,
+) -> list[str]:
     """
-    Delete a document from the PineconeVectorStore
+    Write precomputed embeddings to the configured vector store
 
-    :param document_id: The document ID to delete
+    :param texts: The chunk texts
+    :param vectors: The embedding of each chunk
+    :param metadatas: The metadata of each chunk
+    :param ids: The vector IDs, generated when omitted
+    :return: The IDs of the written vectors
     """
+    ids = ids or [str(uuid.uuid4()) for _ in texts]
+    if isinstance(vector_store, LocalVectorStore):
+        return vector_store.add_embeddings(texts, vectors, metadatas, ids)
+
     index = pc.Index(os.getenv("PINECONE_INDEX_NAME"))
+    index.upsert(
+        vectors=[
+            {"id": id_, "values": vector, "metadata": metadata}
+            for id_, vector, metadata in zip(ids, vectors, metadatas)
+        ]
+    )
+    return ids
+
+
+@timed("upsert")
+async def aupsert_embeddings(
+    texts: list[str],
+    vectors: list[list[float]],
+    metadatas: list[dict],
+    ids: Optional[list[str]] = None,
+) -> list[str]:
+    """
+    Write precomputed embeddings to the configured vector store asynchronously
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        None, upsert_embeddings, texts, vectors, metadatas, ids
+    )
+
+
+def vector_id(document_id: int, chunk_index: int) -> str:
+    """
+    Deterministic ID of a document chunk's vector, so that every vector of a
+    document can be addressed from its ``vector_count`` alone.
+    """
+    return f"{document_id}#{chunk_index}"
+
+
+def parse_vector_id(id_: str) -> Optional[tuple[int, int]]:
+    """
+    Split a vector ID into (document_id, chunk_index)
+
+    :return: None for IDs that do not follow the ``vector_id`` scheme
+    """
+    document_id, sep, chunk_index = id_.partition("#")
+    if not sep or not document_id.isdigit() or not chunk_index.isdigit():
+        return None
+    return int(document_id), int(chunk_index)
+
+
+def _list_document_vector_ids(index, document_id: int) -> list[str]:
+    try:
+        return [id_ for page in index.list(prefix=f"{document_id}#") for id_ in page]
+    except pinecone.PineconeException:
+        # Listing is only supported by serverless indexes.
+        return []
+
+
+def _query_legacy_vector_ids(index, document_id: int) -> list[str]:
     query = index.query(
         vector=[0] * 1536,  # A vector of zeros to get all the matches
         filter={"document_id": {"$eq": document_id}},
         top_k=10000,
-        include_metadata=True,
     )
-    ids_to_delete = [match.id for match in query.matches]
-    if ids_to_delete:
-        index.delete(ids_to_delete)
+    return [match.id for match in query.matches]
 
 
-async def delete_document_async(document_id):
+async def delete_vector_ids(index, ids: list[str]) -> None:
     """
-    Delete a document from the PineconeVectorStore asynchronously
+    Delete vectors by ID in parallel batches of at most DELETE_BATCH_SIZE
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(settings.vector_delete_concurrency)
+
+    async def delete_batch(batch: list[str]) -> None:
+        async with semaphore:
+            await loop.run_in_executor(None, lambda: index.delete(ids=batch))
+
+    await asyncio.gather(
+        *(
+            delete_batch(ids[i : i + DELETE_BATCH_SIZE])
+            for i in range(0, len(ids), DELETE_BATCH_SIZE)
+        )
+    )
+
+
+@timed("delete_vectors")
+async def delete_document_async(document_id: int, vector_count: Optional[int] = None):
+    """
+    Delete a document from the configured vector store asynchronously
 
     :param document_id: The document ID to delete
+    :param vector_count: The number of vectors written for the document, if
+        ingestion completed. Without it the IDs are listed by prefix and, for
+        documents ingested before deterministic IDs, found by querying.
     """
-    loop = asyncio.get_event_loop()
-    fut = loop.run_in_executor(None, delete_document, document_id)
-    return await fut
+    loop = asyncio.get_running_loop()
+    if isinstance(vector_store, LocalVectorStore):
+        await loop.run_in_executor(None, vector_store.delete_document, document_id)
+        return
+
+    index = pc.Index(os.getenv("PINECONE_INDEX_NAME"))
+    if vector_count is not None:
+        ids = [vector_id(document_id, i) for i in range(vector_count)]
+        await delete_vector_ids(index, ids)
+        return
+
+    ids = await loop.run_in_executor(
+        None, _list_document_vector_ids, index, document_id
+    )
+    await delete_vector_ids(index, ids)
+    while True:
+        ids = await loop.run_in_executor(
+            None, _query_legacy_vector_ids, index, document_id
+        )
+        if not ids:
+            break
+        await delete_vector_ids(index, ids)
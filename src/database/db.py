@@ -1,14 +1,109 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+import time
+from typing import Optional
+
+from sqlalchemy import exc, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
 
+from src.services.metrics import metrics
 from src.settings import settings
 
+pool_wait_seconds = metrics.histogram(
+    "pdfchat_db_pool_wait_seconds",
+    "Time to check a connection out of the pool, including opening it.",
+    labels=("pool",),
+)
+pool_timeouts = metrics.counter(
+    "pdfchat_db_pool_timeouts_total",
+    "Checkouts that gave up after the pool timeout.",
+    labels=("pool",),
+)
+
+
+class TimedCheckout:
+    """
+    Pool mixin recording how long each checkout waits for a connection.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_timeouts.inc(self._orig_logging_name)
+            raise
+        finally:
+            pool_wait_seconds.observe(
+                time.perf_counter() - start, self._orig_logging_name
+            )
+
+
+class TimedQueuePool(TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+class TimedNullPool(TimedCheckout, NullPool):
+    pass
+
+
+def create_engine(url: str, name: str) -> AsyncEngine:
+    """
+    Create an engine with the pool configured in settings. SQLite has no
+    pool size to configure: a file database keeps the aiosqlite dialect's
+    default of a new connection per checkout, timed like the queue pool,
+    and an in-memory one its default pool.
+
+    :param url: The database URL
+    :param name: The pool name in logs and metrics
+    :return: The engine
+    """
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        if parsed.database and parsed.database != ":memory:":
+            return create_async_engine(
+                url, poolclass=TimedNullPool, pool_logging_name=name
+            )
+        return create_async_engine(url)
+    return create_async_engine(
+        url,
+        poolclass=TimedQueuePool,
+        pool_logging_name=name,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+        pool_pre_ping=settings.db_pool_pre_ping,
+    )
+
+
 DATABASE_URL = settings.sqlalchemy_database_uri
-engine = create_async_engine(DATABASE_URL)
+READ_DATABASE_URL: Optional[str] = settings.sqlalchemy_read_database_uri
+engine = create_engine(DATABASE_URL, "primary")
+# Without a replica, reads share the primary's pool.
+read_engine = (
+    create_engine(READ_DATABASE_URL, "replica") if READ_DATABASE_URL else engine
+)
 Base = declarative_base()
 async_session = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+read_session = sessionmaker(
+    bind=read_engine, class_=AsyncSession, expire_on_commit=False
+)
 
 
-async def get_db():
+async def get_write_db():
     async with async_session() as db:
         yield db
+
+
+async def get_read_db():
+    """
+    Session for read-only endpoints, served by the read replica when one is
+    configured. A replica may lag the primary, so only use it where a
+    slightly stale result is acceptable.
+    """
+    async with read_session() as db:
+        yield db
+
+
+get_db = get_write_db
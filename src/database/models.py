@@ -1,8 +1,17 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    DateTime,
+    ForeignKey,
+    Enum,
+    Text,
+    Index,
+)
 from sqlalchemy.orm import relationship
 from src.database.db import Base
 from datetime import datetime
-from src.enums import Role
+from src.enums import Role, JobStatus
 
 
 class User(Base):
@@ -20,11 +29,14 @@ class User(Base):
 
 class Document(Base):
     __tablename__ = "documents"
+    __table_args__ = (Index("ix_documents_user_id_id", "user_id", "id"),)
 
     id = Column(Integer, primary_key=True)
     name = Column(String(255), nullable=False)
-    upload_time = Column(DateTime, default=datetime.utcnow(), nullable=False)
+    upload_time = Column(DateTime, default=datetime.utcnow, nullable=False)
     file_path = Column(String(255), nullable=False)
+    file_hash = Column(String(64), index=True)
+    vector_count = Column(Integer)
     user_id = Column(
         Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
     )
@@ -33,10 +45,14 @@ class Document(Base):
     chats = relationship(
         "Chat", back_populates="document", cascade="all, delete-orphan"
     )
+    ingestion_jobs = relationship(
+        "IngestionJob", back_populates="document", cascade="all, delete-orphan"
+    )
 
 
 class Chat(Base):
     __tablename__ = "chats"
+    __table_args__ = (Index("ix_chats_document_id_id", "document_id", "id"),)
 
     id = Column(Integer, primary_key=True)
     name = Column(String(255))
@@ -44,9 +60,14 @@ class Chat(Base):
         Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False
     )
     user_id = Column(
-        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+        Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
     )
-    start_time = Column(DateTime, default=datetime.utcnow(), nullable=False)
+    start_time = Column(DateTime, default=datetime.utcnow, nullable=False)
+    summary = Column(Text)
+    summarized_until_id = Column(Integer)
 
     messages = relationship(
         "Message", back_populates="chat", cascade="all, delete-orphan"
@@ -57,6 +78,10 @@ class Chat(Base):
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        Index("ix_messages_chat_id_timestamp", "chat_id", "timestamp"),
+        Index("ix_messages_chat_id_id", "chat_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True)
     chat_id = Column(
@@ -64,6 +89,32 @@ class Message(Base):
     )
     role = Column(Enum(Role), nullable=False)
     content = Column(String, nullable=False)
-    timestamp = Column(DateTime, default=datetime.utcnow(), nullable=False)
+    timestamp = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     chat = relationship("Chat", back_populates="messages")
+
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+
+    id = Column(Integer, primary_key=True)
+    document_id = Column(
+        Integer,
+        ForeignKey("documents.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    status = Column(
+        Enum(JobStatus), default=JobStatus.QUEUED, nullable=False, index=True
+    )
+    stage = Column(String(50))
+    processed_chunks = Column(Integer, default=0, nullable=False)
+    total_chunks = Column(Integer)
+    attempts = Column(Integer, default=0, nullable=False)
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
+    )
+
+    document = relationship("Document", back_populates="ingestion_jobs")
@@ -1,13 +1,15 @@
-from langchain_community.chat_message_histories import ChatMessageHistory
-from langchain_core.chat_history import BaseChatMessageHistory
-from langchain.schema import HumanMessage, AIMessage
+from datetime import datetime
+from typing import Optional
 
+from sqlalchemy import Row, insert, or_, update
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.models import Message, Chat
-from src.schemas import Message as MessageSchema, Chat as ChatSchema
+from src.database.repository.pagination import fetch_page
 from src.enums import Role
+from src.schemas import Chat as ChatSchema
+from src.services.metrics import timed
 
 
 async def get_chat_by_id(db: AsyncSession, chat_id: int) -> Chat:
@@ -17,6 +19,14 @@ async def get_chat_by_id(db: AsyncSession, chat_id: int) -> Chat:
     return chat
 
 
+@timed("db.get_user_chat")
+async def get_user_chat(db: AsyncSession, chat_id: int, user_id: int) -> Optional[Chat]:
+    stmt = select(Chat).where(Chat.id == chat_id, Chat.user_id == user_id)
+    result = await db.execute(stmt)
+    return result.scalars().first()
+
+
+@timed("db.create_chat")
 async def create_chat(db: AsyncSession, chat: ChatSchema) -> Chat:
     new_chat = Chat(**chat.model_dump())
     db.add(new_chat)
@@ -24,44 +34,161 @@ async def create_chat(db: AsyncSession, chat: ChatSchema) -> Chat:
     return new_chat
 
 
-async def save_message(db: AsyncSession, message: MessageSchema) -> Message:
-    chat = await get_chat_by_id(db, message.chat_id)
-    if not chat:
-        raise ValueError(f"Chat with id {message.chat_id} not found")
-    new_message = Message(**message.model_dump())
-    db.add(new_message)
+def turn_rows(
+    chat_id: int,
+    question: str,
+    answer: Optional[str],
+    asked_at: datetime,
+    answered_at: Optional[datetime] = None,
+) -> list[dict]:
+    rows = [
+        {
+            "chat_id": chat_id,
+            "role": Role.HUMAN,
+            "content": question,
+            "timestamp": asked_at,
+        }
+    ]
+    if answer is not None:
+        rows.append(
+            {
+                "chat_id": chat_id,
+                "role": Role.AI,
+                "content": answer,
+                "timestamp": answered_at or datetime.utcnow(),
+            }
+        )
+    return rows
+
+
+@timed("db.save_messages")
+async def save_messages(db: AsyncSession, rows: list[dict]) -> None:
+    """
+    Insert message rows (chat_id, role, content, timestamp) with one
+    executemany and one commit. The chats are not loaded; callers check
+    them first.
+    """
+    await db.execute(insert(Message), rows)
+    await db.commit()
+
+
+async def save_turn(
+    db: AsyncSession,
+    chat_id: int,
+    question: str,
+    answer: Optional[str],
+    asked_at: datetime,
+) -> None:
+    """
+    Persist a chat turn in a single transaction. Without an answer, as when
+    the client went away mid-stream, only the question is saved.
+    """
+    await save_messages(db, turn_rows(chat_id, question, answer, asked_at))
+
+
+@timed("db.load_chat_history")
+async def load_chat_history(
+    db: AsyncSession,
+    chat_id: int,
+    limit: int,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+) -> list[Row]:
+    stmt = select(Message.id, Message.role, Message.content, Message.timestamp).where(
+        Message.chat_id == chat_id
+    )
+    return await fetch_page(
+        db, stmt, Message.id, limit, before_id, after_id, newest_first=False
+    )
+
+
+@timed("db.get_recent_messages")
+async def get_recent_messages(
+    db: AsyncSession, chat_id: int, after_id: Optional[int], limit: int
+) -> list[Message]:
+    """
+    Newest first, at most ``limit`` messages of a chat with an id greater
+    than ``after_id``.
+    """
+    stmt = select(Message).where(Message.chat_id == chat_id)
+    if after_id is not None:
+        stmt = stmt.where(Message.id > after_id)
+    # Ordered by id, like the summary and page cursors: the message writer
+    # may commit turns out of timestamp order.
+    stmt = stmt.order_by(Message.id.desc()).limit(limit)
+    result = await db.execute(stmt)
+    return result.scalars().all()
+
+
+async def get_messages_between(
+    db: AsyncSession,
+    chat_id: int,
+    after_id: Optional[int],
+    before_id: int,
+    limit: int,
+) -> list[Message]:
+    """
+    The oldest ``limit`` messages of a chat between two message IDs.
+    """
+    stmt = select(Message).where(Message.chat_id == chat_id, Message.id < before_id)
+    if after_id is not None:
+        stmt = stmt.where(Message.id > after_id)
+    stmt = stmt.order_by(Message.id).limit(limit)
+    result = await db.execute(stmt)
+    return result.scalars().all()
+
+
+async def save_chat_summary(
+    db: AsyncSession, chat_id: int, summary: str, summarized_until_id: int
+) -> bool:
+    """
+    Store a chat summary unless a concurrent refresh already summarized up to
+    or beyond ``summarized_until_id``, so the summary never moves backwards.
+
+    :return: Whether the summary was stored
+    """
+    stmt = (
+        update(Chat)
+        .where(
+            Chat.id == chat_id,
+            or_(
+                Chat.summarized_until_id.is_(None),
+                Chat.summarized_until_id < summarized_until_id,
+            ),
+        )
+        .values(summary=summary, summarized_until_id=summarized_until_id)
+    )
+    result = await db.execute(stmt)
     await db.commit()
-    return new_message
+    return result.rowcount == 1
 
 
-async def load_chat_history(db: AsyncSession, chat_id: int) -> BaseChatMessageHistory:
-    chat_history = ChatMessageHistory()
-    result = await db.execute(select(Message).where(Message.chat_id == chat_id))
-    messages = result.scalars().all()
-    for message in messages:
-        if message.role == Role.HUMAN:
-            chat_history.add_message(HumanMessage(content=message.content))
-        elif message.role == Role.AI:
-            chat_history.add_message(AIMessage(content=message.content))
-    return chat_history
+@timed("db.get_chats_by_document_id")
+async def get_chats_by_document_id(
+    db: AsyncSession,
+    document_id: int,
+    limit: int,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+) -> list[Row]:
+    stmt = select(Chat.id, Chat.name, Chat.document_id, Chat.start_time).where(
+        Chat.document_id == document_id
+    )
+    return await fetch_page(db, stmt, Chat.id, limit, before_id, after_id)
 
 
-async def get_chats_by_document_id(db: AsyncSession, document_id: int) -> list[Chat]:
-    stmt = select(Chat).where(Chat.document_id == document_id)
-    result = await db.execute(stmt)
-    chats = result.scalars().all()
-    return chats
+async def get_document_chat_ids(db: AsyncSession, document_id: int) -> list[int]:
+    result = await db.execute(select(Chat.id).where(Chat.document_id == document_id))
+    return result.scalars().all()
 
 
-async def rename_chat(db: AsyncSession, chat_id: int, name: str) -> Chat:
-    chat = await get_chat_by_id(db, chat_id)
+async def rename_chat(db: AsyncSession, chat: Chat, name: str) -> Chat:
     chat.name = name
     await db.commit()
     return chat
 
 
-async def delete_chat(db: AsyncSession, chat_id: int) -> None:
-    chat = await get_chat_by_id(db, chat_id)
+async def delete_chat(db: AsyncSession, chat: Chat) -> None:
     await db.delete(chat)
     await db.commit()
 
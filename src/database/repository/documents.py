@@ -1,13 +1,16 @@
-import pathlib
+from typing import Optional
 
+from sqlalchemy import Row
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.models import Document
+from src.database.repository.pagination import fetch_page
 from src.schemas import Document as DocumentSchema
-from src.chat.vector_store import delete_document_async as delete_document_vector_store
+from src.services.metrics import timed
 
 
+@timed("db.save_document")
 async def save_document(db: AsyncSession, document: DocumentSchema) -> Document:
     new_document = Document(**document.model_dump())
     db.add(new_document)
@@ -15,22 +18,36 @@ async def save_document(db: AsyncSession, document: DocumentSchema) -> Document:
     return new_document
 
 
-async def get_users_documents(db: AsyncSession, user_id: int) -> list[Document]:
-    stmt = select(Document).where(Document.user_id == user_id)
+@timed("db.get_users_documents")
+async def get_users_documents(
+    db: AsyncSession,
+    user_id: int,
+    limit: int,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+) -> list[Row]:
+    stmt = select(
+        Document.id, Document.name, Document.upload_time, Document.vector_count
+    ).where(Document.user_id == user_id)
+    return await fetch_page(db, stmt, Document.id, limit, before_id, after_id)
+
+
+@timed("db.get_user_document")
+async def get_user_document(
+    db: AsyncSession, document_id: int, user_id: int
+) -> Optional[Document]:
+    stmt = select(Document).where(
+        Document.id == document_id, Document.user_id == user_id
+    )
     result = await db.execute(stmt)
-    documents = result.scalars().all()
-    return documents
+    return result.scalars().first()
 
 
-async def delete_document(db: AsyncSession, document_id: int):
-    stmt = select(Document).where(Document.id == document_id)
-    result = await db.execute(stmt)
-    document = result.scalars().first()
-    if not document:
-        return
-    document_path = pathlib.Path(document.file_path)
-    if document_path.exists():
-        document_path.unlink()
+async def get_document_vector_counts(db: AsyncSession) -> dict[int, Optional[int]]:
+    result = await db.execute(select(Document.id, Document.vector_count))
+    return dict(result.all())
+
+
+async def delete_document(db: AsyncSession, document: Document) -> None:
     await db.delete(document)
     await db.commit()
-    await delete_document_vector_store(document_id)
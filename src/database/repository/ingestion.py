@@ -0,0 +1,155 @@
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import update, or_, and_
+from sqlalchemy.future import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import Document, IngestionJob
+from src.enums import JobStatus
+
+
+async def create_job(db: AsyncSession, document_id: int) -> IngestionJob:
+    job = IngestionJob(document_id=document_id, status=JobStatus.QUEUED)
+    db.add(job)
+    await db.commit()
+    return job
+
+
+async def get_job_by_id(db: AsyncSession, job_id: int) -> Optional[IngestionJob]:
+    stmt = select(IngestionJob).where(IngestionJob.id == job_id)
+    result = await db.execute(stmt)
+    return result.scalars().first()
+
+
+async def get_latest_document_job(
+    db: AsyncSession, document_id: int
+) -> Optional[IngestionJob]:
+    stmt = (
+        select(IngestionJob)
+        .where(IngestionJob.document_id == document_id)
+        .order_by(IngestionJob.id.desc())
+        .limit(1)
+    )
+    result = await db.execute(stmt)
+    return result.scalars().first()
+
+
+async def claim_job(db: AsyncSession, job_id: int) -> bool:
+    """
+    Atomically move a queued job to running, so that a job delivered twice
+    (e.g. re-enqueued after a restart) is only processed by one worker.
+    """
+    stmt = (
+        update(IngestionJob)
+        .where(IngestionJob.id == job_id, IngestionJob.status == JobStatus.QUEUED)
+        .values(
+            status=JobStatus.RUNNING,
+            attempts=IngestionJob.attempts + 1,
+            error=None,
+            updated_at=datetime.utcnow(),
+        )
+    )
+    result = await db.execute(stmt)
+    await db.commit()
+    return result.rowcount == 1
+
+
+def _owned(job_id: int, attempt: Optional[int]):
+    condition = IngestionJob.id == job_id
+    if attempt is None:
+        return condition
+    # Every claim increments attempts, so a job requeued after its lease
+    # expired and claimed again no longer matches its previous attempt.
+    return and_(
+        condition,
+        IngestionJob.status == JobStatus.RUNNING,
+        IngestionJob.attempts == attempt,
+    )
+
+
+async def update_job(
+    db: AsyncSession, job_id: int, attempt: Optional[int] = None, **values
+) -> bool:
+    """
+    Update a job, also renewing its lease.
+
+    :param attempt: Only update the job while it runs this attempt
+    :return: Whether the job was updated
+    """
+    values.setdefault("updated_at", datetime.utcnow())
+    stmt = update(IngestionJob).where(_owned(job_id, attempt)).values(**values)
+    result = await db.execute(stmt)
+    await db.commit()
+    return result.rowcount == 1
+
+
+async def complete_job(
+    db: AsyncSession, job_id: int, attempt: int, document_id: int, vector_count: int
+) -> bool:
+    """
+    Mark a job succeeded and record its document's vector count in one
+    transaction, unless the attempt has lost the job to another worker.
+
+    :return: Whether the result was recorded
+    """
+    stmt = (
+        update(IngestionJob)
+        .where(_owned(job_id, attempt))
+        .values(status=JobStatus.SUCCEEDED, stage="done", updated_at=datetime.utcnow())
+    )
+    result = await db.execute(stmt)
+    if result.rowcount != 1:
+        await db.rollback()
+        return False
+    stmt = (
+        update(Document)
+        .where(Document.id == document_id)
+        .values(vector_count=vector_count)
+    )
+    await db.execute(stmt)
+    await db.commit()
+    return True
+
+
+async def get_recoverable_jobs(
+    db: AsyncSession, lease: timedelta, include_queued: bool
+) -> list[IngestionJob]:
+    """
+    Jobs that were interrupted by a restart: jobs that have not been touched
+    for longer than the lease, which a running job renews, and, when the
+    broker does not persist its queue, every queued job.
+    """
+    stale = and_(
+        IngestionJob.status.in_([JobStatus.QUEUED, JobStatus.RUNNING]),
+        IngestionJob.updated_at < datetime.utcnow() - lease,
+    )
+    condition = stale
+    if include_queued:
+        condition = or_(stale, IngestionJob.status == JobStatus.QUEUED)
+    stmt = select(IngestionJob).where(condition).order_by(IngestionJob.id)
+    result = await db.execute(stmt)
+    return result.scalars().all()
+
+
+async def requeue_job(
+    db: AsyncSession, job_id: int, stale_before: Optional[datetime] = None
+) -> bool:
+    """
+    Queue a job again.
+
+    :param stale_before: Only requeue the job if it has not been updated
+        since, so that a job whose lease was just renewed keeps running
+    :return: Whether the job was requeued
+    """
+    condition = IngestionJob.id == job_id
+    if stale_before is not None:
+        condition = and_(condition, IngestionJob.updated_at < stale_before)
+    stmt = (
+        update(IngestionJob)
+        .where(condition)
+        .values(status=JobStatus.QUEUED, updated_at=datetime.utcnow())
+    )
+    result = await db.execute(stmt)
+    await db.commit()
+    return result.rowcount == 1
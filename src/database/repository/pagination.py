@@ -0,0 +1,45 @@
+from typing import Optional
+
+from sqlalchemy import Row, Select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import InstrumentedAttribute
+
+
+async def fetch_page(
+    db: AsyncSession,
+    stmt: Select,
+    key: InstrumentedAttribute,
+    limit: int,
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
+    newest_first: bool = True,
+) -> list[Row]:
+    """
+    Keyset pagination on an increasing key. Without a cursor the newest
+    ``limit`` rows are returned; ``before_id`` pages towards older rows and
+    ``after_id`` towards newer ones, so the cost of a page does not depend
+    on how many rows precede it. With both, the page holds the oldest rows
+    between them.
+
+    :param db: The database session
+    :param stmt: The filtered query, without ORDER BY or LIMIT
+    :param key: The key column, usually the primary key
+    :param limit: The page size
+    :param before_id: Only rows with a key below this one
+    :param after_id: Only rows with a key above this one
+    :param newest_first: Whether the page is returned newest or oldest first
+    :return: The rows of the page
+    """
+    if before_id is not None:
+        stmt = stmt.where(key < before_id)
+    if after_id is not None:
+        stmt = stmt.where(key > after_id).order_by(key.asc())
+        ascending = True
+    else:
+        stmt = stmt.order_by(key.desc())
+        ascending = False
+    result = await db.execute(stmt.limit(limit))
+    rows = result.all()
+    if ascending == newest_first:
+        rows.reverse()
+    return rows
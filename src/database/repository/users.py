@@ -5,8 +5,10 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.database.models import User
 from src.schemas import User as UserSchema
+from src.services.metrics import timed
 
 
+@timed("db.add_user")
 async def add_user(db: AsyncSession, user: UserSchema) -> User:
     user = User(**user.model_dump())
     db.add(user)
@@ -15,6 +17,13 @@ async def add_user(db: AsyncSession, user: UserSchema) -> User:
     return user
 
 
+@timed("db.get_user_by_email")
 async def get_user_by_email(db: AsyncSession, email: str) -> User:
     result = await db.execute(select(User).where(User.email == email))
     return result.scalars().first()
+
+
+async def update_user_password(db: AsyncSession, user: User, password: str) -> User:
+    user.password = password
+    await db.commit()
+    return user
@@ -5,3 +5,10 @@ class Role(Enum):
     HUMAN = "human"
     AI = "ai"
     SYSTEM = "system"
+
+
+class JobStatus(Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
@@ -1,125 +1,354 @@
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    WebSocket,
+    WebSocketDisconnect,
+    WebSocketException,
+    status,
+)
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.chat.chains import build_rag_chain
-from src.database.db import get_db
+from src.chat.chains import build_rag_chain, update_chat_summary
+from src.chat.session import ChatSession
+from src.database.db import get_db, get_read_db, async_session
+from src.database.models import Chat, Document
 from src.database.repository.chat import (
     create_chat,
-    get_chat_by_id,
-    save_message,
     get_chats_by_document_id,
     load_chat_history,
     rename_chat,
     delete_chat,
-    get_user_chats,
+    turn_rows,
+)
+from src.schemas import (
+    Chat as ChatSchema,
+    ChatResponse,
+    Message as MessageSchema,
+    MessageResponse,
 )
-from src.database.repository.documents import get_users_documents
-from src.enums import Role
-from src.schemas import Chat as ChatSchema, Message as MessageSchema
 from src.services.auth import auth_service
+from src.services.message_writer import message_writer, persist_turn
+from src.settings import settings
+from src.services.ownership import (
+    get_owned_chat,
+    get_owned_document,
+    get_readable_chat,
+    get_readable_document,
+    require_owned_chat,
+)
 
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/chat", tags=["chat"])
 
 
+def format_sse(data: dict, event: Optional[str] = None) -> str:
+    payload = f"data: {json.dumps(data)}\n\n"
+    if event:
+        payload = f"event: {event}\n{payload}"
+    return payload
+
+
 @router.post("/message")
 async def save_message_endpoint(
     message: MessageSchema,
+    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
     user=Depends(auth_service.get_current_user),
 ):
-    chats = await get_user_chats(db, user.id)
-    if message.chat_id not in [chat.id for chat in chats]:
-        raise HTTPException(status_code=404, detail="Chat not found")
-
-    message.role = Role.HUMAN
-    await save_message(db, message)
-    chat = await get_chat_by_id(db, message.chat_id)
-    chain, chat_history = await build_rag_chain(chat.document_id, chat.id, db)
+    asked_at = datetime.utcnow()
+    chat = await require_owned_chat(db, message.chat_id, user)
+
+    chain, chat_history = await build_rag_chain(chat, db, message.content)
     input_data = {"input": message.content, "chat_history": chat_history}
 
-    response = await chain.ainvoke(input_data)
-    response_message = MessageSchema(
-        chat_id=message.chat_id,
-        content=response,
-        role=Role.AI,
-    )
-    await save_message(db, response_message)
+    try:
+        response = await chain.ainvoke(input_data)
+    except BaseException:
+        # Keep the question when no answer came, as the stream does. The
+        # writer's session completes even if this request was cancelled.
+        try:
+            await persist_turn(chat.id, message.content, None, asked_at)
+        except RuntimeError:
+            pass  # Already logged by the message writer.
+        raise
+    await persist_turn(chat.id, message.content, response, asked_at, db)
+    background_tasks.add_task(update_chat_summary, message.chat_id)
     return response
 
 
+@router.post("/message/stream")
+async def stream_message_endpoint(
+    message: MessageSchema,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
+    user=Depends(auth_service.get_current_user),
+):
+    """
+    Same as /chat/message, but the answer is sent token by token as
+    Server-Sent Events. The turn is saved once the stream completes; if the
+    client disconnects, the upstream generation is cancelled and only the
+    question is saved.
+    """
+    asked_at = datetime.utcnow()
+    chat = await require_owned_chat(db, message.chat_id, user)
+
+    chain, chat_history = await build_rag_chain(chat, db, message.content)
+    input_data = {"input": message.content, "chat_history": chat_history}
+
+    async def event_stream():
+        tokens = []
+        answer = None
+        stream = chain.astream(input_data)
+        try:
+            async for token in stream:
+                if await request.is_disconnected():
+                    logger.info("Client disconnected from chat %s", message.chat_id)
+                    break
+                tokens.append(token)
+                yield format_sse({"token": token}, event="token")
+            else:
+                answer = "".join(tokens)
+        except Exception as e:
+            logger.exception("Streaming failed for chat %s", message.chat_id)
+            yield format_sse({"detail": str(e)}, event="error")
+        finally:
+            # The request-scoped session is closed once the response starts,
+            # so the turn is saved by the message writer, which finishes even
+            # if this response is cancelled.
+            saved = asyncio.ensure_future(
+                persist_turn(chat.id, message.content, answer, asked_at)
+            )
+            # Closing the generator cancels the in-flight LLM request.
+            await stream.aclose()
+        try:
+            await asyncio.shield(saved)
+        except Exception:
+            # Already logged by the message writer.
+            yield format_sse(
+                {"detail": "The answer could not be saved."}, event="error"
+            )
+            return
+        if answer is not None:
+            yield format_sse({"content": answer}, event="end")
+
+    background_tasks.add_task(update_chat_summary, message.chat_id)
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _websocket_token(websocket: WebSocket) -> Optional[str]:
+    # Browsers cannot set headers on a WebSocket, so the token may also be
+    # passed as a query parameter.
+    scheme, _, token = websocket.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        return token
+    return websocket.query_params.get("token")
+
+
+async def _stream_turn(websocket: WebSocket, session: ChatSession, question: str):
+    asked_at = datetime.utcnow()
+    tokens = []
+    answer = None
+    stream = session.chain.astream(
+        {"input": question, "chat_history": session.context(question)}
+    )
+    try:
+        async for token in stream:
+            tokens.append(token)
+            await websocket.send_json({"event": "token", "token": token})
+        answer = "".join(tokens)
+    except WebSocketDisconnect:
+        logger.info("Client disconnected from chat %s", session.chat_id)
+        raise
+    except Exception as e:
+        logger.exception("Streaming failed for chat %s", session.chat_id)
+        await websocket.send_json({"event": "error", "detail": str(e)})
+    finally:
+        # Closing the generator cancels the in-flight LLM request.
+        await stream.aclose()
+        # Saved in the background; without an answer only the question is.
+        session.last_save = message_writer.submit(
+            turn_rows(session.chat_id, question, answer, asked_at)
+        )
+    if answer is not None:
+        session.add_turn(question, answer)
+        await websocket.send_json({"event": "end", "content": answer})
+
+
+@router.websocket("/ws/{chat_id}")
+async def chat_websocket(websocket: WebSocket, chat_id: int):
+    """
+    Chat over a WebSocket. The access token (an ``Authorization`` header or
+    the ``token`` query parameter) and the chat are checked once on connect;
+    the history and the chain then stay in memory for the connection, so a
+    turn needs no database round trip before the LLM is called. The
+    connection is closed when the token expires.
+
+    Send ``{"content": "..."}`` as a text frame; the answer arrives as
+    ``token`` events and an ``end`` event with the whole answer, or an
+    ``error`` event. Turns are saved in the background. The connection is
+    closed when the chat is deleted and after ``settings.ws_idle_timeout``
+    idle seconds. ``settings.ws_max_message_chars`` caps the question passed
+    to the LLM; the memory a frame takes is bounded by the server's
+    WebSocket size limit, ``settings.ws_max_frame_bytes`` when run from
+    ``main.py`` (``--ws-max-size`` for the uvicorn CLI).
+    """
+    token = _websocket_token(websocket)
+    async with async_session() as db:
+        try:
+            user = await auth_service.authenticate(token, db)
+            chat = await require_owned_chat(db, chat_id, user)
+        except HTTPException as e:
+            raise WebSocketException(
+                code=status.WS_1008_POLICY_VIOLATION, reason=e.detail
+            )
+    expires_at = auth_service.token_expiry(token)
+    session = await ChatSession.open(chat)
+    await websocket.accept()
+    with session:
+        try:
+            while True:
+                timeout = settings.ws_idle_timeout
+                if expires_at is not None:
+                    timeout = min(timeout, expires_at - time.time())
+                try:
+                    if timeout <= 0:
+                        raise asyncio.TimeoutError
+                    message = await asyncio.wait_for(websocket.receive(), timeout)
+                except asyncio.TimeoutError:
+                    if expires_at is not None and time.time() >= expires_at:
+                        await websocket.close(
+                            code=status.WS_1008_POLICY_VIOLATION,
+                            reason="Token expired",
+                        )
+                    else:
+                        await websocket.close(reason="Idle timeout")
+                    return
+                if message["type"] == "websocket.disconnect":
+                    return
+                text = message.get("text")
+                if text is None:
+                    await websocket.send_json(
+                        {"event": "error", "detail": "Only text frames are accepted."}
+                    )
+                    continue
+                if len(text.encode("utf-8")) > settings.ws_max_frame_bytes:
+                    await websocket.close(
+                        code=status.WS_1009_MESSAGE_TOO_BIG, reason="Message too big"
+                    )
+                    return
+                try:
+                    question = json.loads(text)["content"]
+                except (ValueError, KeyError, TypeError):
+                    question = None
+                if not isinstance(question, str) or not question.strip():
+                    await websocket.send_json(
+                        {"event": "error", "detail": 'Expected {"content": "..."}'}
+                    )
+                    continue
+                if len(question) > settings.ws_max_message_chars:
+                    await websocket.send_json(
+                        {
+                            "event": "error",
+                            "detail": f"Messages are limited to "
+                            f"{settings.ws_max_message_chars} characters.",
+                        }
+                    )
+                    continue
+                if not await session.chat_exists():
+                    await websocket.close(
+                        code=status.WS_1008_POLICY_VIOLATION, reason="Chat not found"
+                    )
+                    return
+                if session.save_failed():
+                    await websocket.send_json(
+                        {"event": "error", "detail": "The last answer was not saved."}
+                    )
+                await _stream_turn(websocket, session, question)
+        except WebSocketDisconnect:
+            pass
+
+
 @router.post("/")
 async def create_chat_endpoint(
-    document_id: int,
+    document: Document = Depends(get_owned_document),
     db: AsyncSession = Depends(get_db),
     user=Depends(auth_service.get_current_user),
     name: Optional[str] = None,
 ):
     return await create_chat(
-        db, ChatSchema(document_id=document_id, user_id=user.id, name=name)
+        db, ChatSchema(document_id=document.id, user_id=user.id, name=name)
     )
 
 
 @router.get("/{chat_id}")
-async def get_chat_by_id_endpoint(
-    chat_id: int,
-    db: AsyncSession = Depends(get_db),
-    user=Depends(auth_service.get_current_user),
-):
-    chats = await get_user_chats(db, user.id)
-    if chat_id not in [chat.id for chat in chats]:
-        raise HTTPException(status_code=404, detail="Chat not found")
-    return await get_chat_by_id(db, chat_id)
+async def get_chat_by_id_endpoint(chat: Chat = Depends(get_owned_chat)):
+    return chat
 
 
-@router.get("/document/{document_id}")
+@router.get("/document/{document_id}", response_model=list[ChatResponse])
 async def get_chats_by_document_id_endpoint(
-    document_id: int,
-    db: AsyncSession = Depends(get_db),
-    user=Depends(auth_service.get_current_user),
+    document: Document = Depends(get_readable_document),
+    db: AsyncSession = Depends(get_read_db),
+    limit: int = Query(settings.page_size, ge=1, le=settings.max_page_size),
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
 ):
-    documents = await get_users_documents(db, user.id)
-    if document_id not in [document.id for document in documents]:
-        raise HTTPException(status_code=404, detail="Document not found")
-    return await get_chats_by_document_id(db, document_id)
+    """
+    A page of the document's chats, newest first. Pass the id of the last
+    chat as ``before_id`` to get the next page.
+    """
+    return await get_chats_by_document_id(db, document.id, limit, before_id, after_id)
 
 
-@router.get("/history/{chat_id}")
+@router.get("/history/{chat_id}", response_model=list[MessageResponse])
 async def get_chat_history(
-    chat_id: int,
-    db: AsyncSession = Depends(get_db),
-    user=Depends(auth_service.get_current_user),
+    chat: Chat = Depends(get_readable_chat),
+    db: AsyncSession = Depends(get_read_db),
+    limit: int = Query(settings.page_size, ge=1, le=settings.max_page_size),
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
 ):
-    chats = await get_user_chats(db, user.id)
-    if chat_id not in [chat.id for chat in chats]:
-        raise HTTPException(status_code=404, detail="Chat not found")
-    chat = await get_chat_by_id(db, chat_id)
-    history = await load_chat_history(db, chat.id)
-    return history
+    """
+    A page of the chat's messages, oldest first; by default the latest
+    ``limit`` messages. Pass the id of the first message as ``before_id`` to
+    load earlier messages.
+    """
+    await message_writer.wait_for_chat(chat.id)
+    return await load_chat_history(db, chat.id, limit, before_id, after_id)
 
 
 @router.put("/{chat_id}")
 async def rename_chat_endpoint(
-    chat_id: int,
     name: str,
+    chat: Chat = Depends(get_owned_chat),
     db: AsyncSession = Depends(get_db),
-    user=Depends(auth_service.get_current_user),
 ):
-    chats = await get_user_chats(db, user.id)
-    if chat_id not in [chat.id for chat in chats]:
-        raise HTTPException(status_code=404, detail="Chat not found")
-    return await rename_chat(db, chat_id, name)
+    return await rename_chat(db, chat, name)
 
 
 @router.delete("/{chat_id}")
 async def delete_chat_endpoint(
-    chat_id: int,
+    chat: Chat = Depends(get_owned_chat),
     db: AsyncSession = Depends(get_db),
-    user=Depends(auth_service.get_current_user),
 ):
-    chats = await get_user_chats(db, user.id)
-    if chat_id not in [chat.id for chat in chats]:
-        raise HTTPException(status_code=404, detail="Chat not found")
-    return await delete_chat(db, chat_id)
+    ChatSession.chat_deleted(chat.id)
+    return await delete_chat(db, chat)
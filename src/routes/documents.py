@@ -1,25 +1,44 @@
-import shutil
 from pathlib import Path
+from typing import Optional
 from uuid import uuid4
 
-from fastapi import APIRouter, Depends, File, UploadFile, HTTPException
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    UploadFile,
+    HTTPException,
+    Query,
+    status,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.chat.process_pdf import create_embeddings_for_pdf
-from src.database.db import get_db
-from src.database.repository.documents import (
-    save_document,
-    get_users_documents,
-    delete_document,
+from src.database.db import get_db, get_read_db
+from src.database.models import Document
+from src.database.repository.documents import save_document, get_users_documents
+from src.database.repository.ingestion import get_latest_document_job
+from src.schemas import (
+    Document as DocumentSchema,
+    DocumentResponse,
+    DocumentUploadResponse,
+    IngestionJobResponse,
 )
-from src.schemas import Document as DocumentSchema
 from src.services.auth import auth_service
+from src.services.documents import delete_document
+from src.services.ingestion import ingestion_queue
+from src.services.ownership import get_owned_document
+from src.services.uploads import store_upload
+from src.settings import settings
 
 
 router = APIRouter(prefix="/documents", tags=["documents"])
 
 
-@router.post("/upload")
+@router.post(
+    "/upload",
+    response_model=DocumentUploadResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+)
 async def upload_file(
     file: UploadFile = File(...),
     db: AsyncSession = Depends(get_db),
@@ -38,36 +57,57 @@ async def upload_file(
 
     file_path = save_directory / file_name
 
-    with file_path.open("wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    upload = await store_upload(file, file_path)
 
     document = DocumentSchema(
         name=file.filename,
         file_path=file_path.as_posix(),
         user_id=user.id,
+        file_hash=upload.sha256,
     )
     document_db = await save_document(db, document)
 
-    # TODO Rewrite this to use a task queue
-    await create_embeddings_for_pdf(document_id=document_db.id, document_path=file_path)
-    return document_db
+    job = await ingestion_queue.enqueue(db, document_db.id)
+    return DocumentUploadResponse(
+        id=document_db.id,
+        name=document_db.name,
+        file_path=document_db.file_path,
+        user_id=document_db.user_id,
+        job_id=job.id,
+        status=job.status,
+    )
 
 
-@router.get("/")
+@router.get("/", response_model=list[DocumentResponse])
 async def get_documents(
-    db: AsyncSession = Depends(get_db), user=Depends(auth_service.get_current_user)
+    db: AsyncSession = Depends(get_read_db),
+    user=Depends(auth_service.get_current_user),
+    limit: int = Query(settings.page_size, ge=1, le=settings.max_page_size),
+    before_id: Optional[int] = None,
+    after_id: Optional[int] = None,
 ):
-    return await get_users_documents(db, user.id)
+    """
+    A page of the user's documents, newest first. Pass the id of the last
+    document as ``before_id`` to get the next page.
+    """
+    return await get_users_documents(db, user.id, limit, before_id, after_id)
+
+
+@router.get("/{document_id}/status", response_model=IngestionJobResponse)
+async def get_document_status(
+    document: Document = Depends(get_owned_document),
+    db: AsyncSession = Depends(get_db),
+):
+    job = await get_latest_document_job(db, document.id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="No ingestion job found.")
+    return job
 
 
 @router.delete("/{document_id}")
 async def delete_document_by_id(
-    document_id: int,
+    document: Document = Depends(get_owned_document),
     db: AsyncSession = Depends(get_db),
-    user=Depends(auth_service.get_current_user),
 ):
-    documents = await get_users_documents(db, user.id)
-    if document_id not in [document.id for document in documents]:
-        raise HTTPException(status_code=404, detail="Document not found.")
-    await delete_document(db, document_id)
+    await delete_document(db, document)
     return {"message": "Document deleted successfully."}
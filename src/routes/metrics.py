@@ -0,0 +1,103 @@
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import PlainTextResponse
+
+from src.chat.chains import answer_cache, chain_factory
+from src.chat.session import ChatSession
+from src.chat.vector_store import hybrid_stats
+from src.services.auth import auth_service
+from src.services.metrics import CONTENT_TYPE, metrics
+from src.services.user_cache import user_cache
+from src.settings import settings
+
+
+router = APIRouter(tags=["metrics"])
+
+metrics.counter_callback(
+    "pdfchat_auth_cache_hits_total",
+    "Requests authenticated from the user cache.",
+    lambda: user_cache.hits,
+)
+metrics.counter_callback(
+    "pdfchat_auth_cache_misses_total",
+    "Requests that looked the user up in the database.",
+    lambda: user_cache.misses,
+)
+metrics.counter_callback(
+    "pdfchat_auth_cache_errors_total",
+    "User cache operations that failed because Redis was unreachable.",
+    lambda: user_cache.errors,
+)
+metrics.counter_callback(
+    "pdfchat_answer_cache_hits_total",
+    "Questions answered from the semantic answer cache.",
+    lambda: answer_cache.hits,
+)
+metrics.counter_callback(
+    "pdfchat_answer_cache_misses_total",
+    "Questions that ran the RAG chain.",
+    lambda: answer_cache.misses,
+)
+metrics.counter_callback(
+    "pdfchat_speculative_retrieval_kept_total",
+    "Speculative retrievals used as they were.",
+    lambda: chain_factory.speculation_stats.kept,
+)
+metrics.counter_callback(
+    "pdfchat_speculative_retrieval_merged_total",
+    "Speculative retrievals merged with a search for the rewritten question.",
+    lambda: chain_factory.speculation_stats.merged,
+)
+metrics.counter_callback(
+    "pdfchat_hybrid_retrieval_lexical_only_total",
+    "Hybrid retrievals answered by BM25 alone.",
+    lambda: hybrid_stats.lexical_only,
+)
+metrics.counter_callback(
+    "pdfchat_hybrid_retrieval_fused_total",
+    "Hybrid retrievals that also ran the vector search.",
+    lambda: hybrid_stats.fused,
+)
+metrics.counter_callback(
+    "pdfchat_password_hash_rejected_total",
+    "Password hashing requests rejected with 503 because the pool was full.",
+    lambda: auth_service.hashing_pool.rejected,
+)
+
+metrics.gauge_callback(
+    "pdfchat_websocket_sessions",
+    "Open WebSocket chat sessions.",
+    lambda: ChatSession.active,
+)
+
+
+def verify_metrics_token(authorization: Optional[str] = Header(None)) -> None:
+    """
+    Require ``Authorization: Bearer <METRICS_TOKEN>`` when a token is set.
+    """
+    if settings.metrics_token is None:
+        return
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(
+        token.encode(), settings.metrics_token.encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+@router.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    include_in_schema=False,
+    dependencies=[Depends(verify_metrics_token)],
+)
+async def get_metrics():
+    """
+    Prometheus metrics of this process.
+    """
+    return PlainTextResponse(metrics.render(), media_type=CONTENT_TYPE)
@@ -13,6 +13,7 @@ from src.database.db import get_db
 from src.database.repository.users import (
     add_user,
     get_user_by_email,
+    update_user_password,
 )
 from src.schemas import (
     UserCreate,
@@ -39,8 +40,10 @@ async def create_user(
         UserResponse: The created user data.
     """
     try:
-        user.password = auth_service.get_password_hash(user.password)
+        user.password = await auth_service.get_password_hash(user.password)
         return await add_user(db=db, user=user)
+    except HTTPException:
+        raise
     except IntegrityError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -71,16 +74,26 @@ async def login(
     """
     try:
         db_user = await get_user_by_email(db=db, email=body.username)
-        if not db_user or not auth_service.verify_password(
+        if not db_user:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Incorrect username or password.",
+            )
+        verified, new_hash = await auth_service.verify_password(
             body.password, db_user.password
-        ):
+        )
+        if not verified:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect username or password.",
             )
+        if new_hash:
+            await update_user_password(db, db_user, new_hash)
         return {
             "access_token": auth_service.create_access_token({"sub": db_user.email})
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -1,7 +1,8 @@
+from datetime import datetime
 from typing import Optional
 
-from pydantic import BaseModel, EmailStr
-from src.enums import Role
+from pydantic import BaseModel, ConfigDict, EmailStr
+from src.enums import Role, JobStatus
 
 
 class User(BaseModel):
@@ -24,6 +25,7 @@ class Document(BaseModel):
     name: str
     file_path: str
     user_id: int
+    file_hash: Optional[str] = None
 
 
 class Chat(BaseModel):
@@ -36,3 +38,54 @@ class Message(BaseModel):
     chat_id: int
     role: Optional[Role] = None
     content: str
+
+
+class IngestionJobResponse(BaseModel):
+    id: int
+    document_id: int
+    status: JobStatus
+    stage: Optional[str] = None
+    processed_chunks: int
+    total_chunks: Optional[int] = None
+    attempts: int
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class DocumentUploadResponse(BaseModel):
+    id: int
+    name: str
+    file_path: str
+    user_id: int
+    job_id: int
+    status: JobStatus
+
+
+class DocumentResponse(BaseModel):
+    id: int
+    name: str
+    upload_time: datetime
+    vector_count: Optional[int] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ChatResponse(BaseModel):
+    id: int
+    name: Optional[str] = None
+    document_id: int
+    start_time: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class MessageResponse(BaseModel):
+    id: int
+    role: Role
+    content: str
+    timestamp: datetime
+
+    model_config = ConfigDict(from_attributes=True)
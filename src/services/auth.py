@@ -1,4 +1,5 @@
 from typing import Optional
+import time
 from datetime import datetime, timedelta
 
 from jose import JWTError, jwt
@@ -9,8 +10,10 @@ from sqlalchemy.orm import Session
 
 from src.settings import settings
 from src.database.db import get_db
-from src.database.models import User
 from src.database.repository.users import get_user_by_email
+from src.services.hashing import HashingPool
+from src.services.metrics import timed
+from src.services.user_cache import CurrentUser, user_cache
 
 
 class Auth:
@@ -18,35 +21,54 @@ class Auth:
     Class handling authentication-related operations such as password hashing, token generation, and user verification.
     """
 
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    pwd_context = CryptContext(
+        schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.bcrypt_rounds
+    )
+    hashing_pool = HashingPool(
+        workers=settings.password_hash_workers,
+        queue_size=settings.password_hash_queue_size,
+    )
     SECRET_KEY = settings.jwt_secret_key
     ALGORITHM = settings.jwt_algorithm
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/users/login", auto_error=False)
 
-    def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+    async def verify_password(
+        self, plain_password: str, hashed_password: str
+    ) -> tuple[bool, Optional[str]]:
         """
-        Verifies if the plain password matches the hashed password.
+        Verifies if the plain password matches the hashed password. Runs in the
+        hashing pool.
 
         Args:
             plain_password (str): The plain password to be verified.\n
             hashed_password (str): The hashed password to compare against.\n
 
+        Raises:
+            HTTPException: 503 if the hashing pool is saturated.
+
         Returns:
-            bool: True if the plain password matches the hashed password, False otherwise.
+            tuple: Whether the password matches, and a new hash to store if the
+            old one uses deprecated settings (e.g. fewer bcrypt rounds), else None.
         """
-        return self.pwd_context.verify(plain_password, hashed_password)
+        return await self.hashing_pool.run(
+            self.pwd_context.verify_and_update, plain_password, hashed_password
+        )
 
-    def get_password_hash(self, password: str) -> str:
+    async def get_password_hash(self, password: str) -> str:
         """
-        Returns the hashed version of the provided password.
+        Returns the hashed version of the provided password. Runs in the
+        hashing pool.
 
         Args:
             password (str): The password to be hashed.
 
+        Raises:
+            HTTPException: 503 if the hashing pool is saturated.
+
         Returns:
             str: The hashed password.
         """
-        return self.pwd_context.hash(password)
+        return await self.hashing_pool.run(self.pwd_context.hash, password)
 
     def create_access_token(
         self, data: dict, expires_delta: Optional[float] = None
@@ -77,11 +99,14 @@ class Auth:
         )
         return encoded_access_token
 
+    @timed("auth")
     async def get_current_user(
         self, token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
-    ) -> User:
+    ) -> CurrentUser:
         """
         Returns the current user based on the provided access token.
+        Verified tokens are cached until they expire or for at most
+        ``settings.auth_cache_ttl`` seconds, so most requests skip the database.
 
         Args:
             token (str, optional): The access token. Defaults to Depends(oauth2_scheme).\n
@@ -91,13 +116,35 @@ class Auth:
             HTTPException: If the access token is invalid or expired.
 
         Returns:
-            User: The current user.
+            CurrentUser: The current user.
+        """
+        return await self.authenticate(token, db)
+
+    async def authenticate(self, token: Optional[str], db: Session) -> CurrentUser:
+        """
+        Resolves an access token to its user, from the cache if possible.
+        Used directly where no request dependency applies, e.g. WebSockets.
+
+        Args:
+            token (str, optional): The access token.\n
+            db (Session): The database session.
+
+        Raises:
+            HTTPException: If the access token is missing, invalid or expired.
+
+        Returns:
+            CurrentUser: The user the token belongs to.
         """
         credentials_exception = HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+        if not token:
+            raise credentials_exception
+        cached = await user_cache.get(token)
+        if cached is not None:
+            return cached
         email = None
         try:
             payload: dict = jwt.decode(
@@ -111,7 +158,30 @@ class Auth:
         user = await get_user_by_email(db, email)
         if user is None:
             raise credentials_exception
-        return user
+        current_user = CurrentUser(id=user.id, email=user.email)
+        expires_in = payload.get("exp", 0) - time.time()
+        await user_cache.set(token, current_user, expires_in)
+        return current_user
+
+    def token_expiry(self, token: str) -> Optional[float]:
+        """
+        Returns when an access token expires.
+
+        Args:
+            token (str): The access token.
+
+        Returns:
+            float: The expiry as a Unix timestamp, None if the token has none
+            or 0 if it is invalid or already expired.
+        """
+        try:
+            payload: dict = jwt.decode(
+                token, self.SECRET_KEY, algorithms=[self.ALGORITHM]
+            )
+        except JWTError:
+            return 0.0
+        exp = payload.get("exp")
+        return float(exp) if exp is not None else None
 
     async def create_reset_password_token(self, email: str, request: Request) -> str:
         """
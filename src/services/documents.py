@@ -0,0 +1,35 @@
+import pathlib
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.chat.chains import answer_cache, chain_factory
+from src.chat.session import ChatSession
+from src.chat.vector_store import delete_document_async as delete_document_vector_store
+from src.chat.vector_store import lexical_index
+from src.database.models import Document
+from src.database.repository.chat import get_document_chat_ids
+from src.database.repository.documents import delete_document as delete_document_row
+
+
+async def delete_document(db: AsyncSession, document: Document) -> None:
+    """
+    Deletes a document with its chats, ends the WebSocket sessions of those
+    chats, then deletes its file, vectors, lexical index and the chains and
+    answers cached for it.
+
+    Args:
+        db (AsyncSession): The database session.\n
+        document (Document): The document to delete.
+    """
+    document_id = document.id
+    document_path = pathlib.Path(document.file_path)
+    vector_count = document.vector_count
+    chat_ids = await get_document_chat_ids(db, document_id)
+    await delete_document_row(db, document)
+    for chat_id in chat_ids:
+        ChatSession.chat_deleted(chat_id)
+    document_path.unlink(missing_ok=True)
+    chain_factory.invalidate(document_id)
+    answer_cache.invalidate(document_id)
+    lexical_index.delete(document_id)
+    await delete_document_vector_store(document_id, vector_count)
@@ -0,0 +1,58 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+from fastapi import HTTPException, status
+
+T = TypeVar("T")
+
+
+class HashingPool:
+    """
+    Bounded thread pool for password hashing. bcrypt releases the GIL, so
+    hashes run in parallel without blocking the event loop. Once ``workers``
+    hashes are running and ``queue_size`` more are waiting, new requests are
+    rejected with 503 instead of queueing behind them.
+    """
+
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.pending = 0
+        self.rejected = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="password-hashing"
+            )
+        return self._executor
+
+    async def run(self, fn: Callable[..., T], *args) -> T:
+        """
+        Run a hashing function in the pool.
+
+        :param fn: The function to run
+        :param args: Its arguments
+        :return: The function's result
+        :raises HTTPException: 503 if the pool queue is full
+        """
+        if self.pending >= self.workers + self.queue_size:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many authentication requests, try again later.",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.pending -= 1
+
+    def stop(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,288 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.chat.process_pdf import create_embeddings_for_pdf
+from src.database.db import async_session
+from src.database.models import Document, IngestionJob
+from src.database.repository.ingestion import (
+    create_job,
+    claim_job,
+    complete_job,
+    get_job_by_id,
+    get_recoverable_jobs,
+    requeue_job,
+    update_job,
+)
+from src.enums import JobStatus
+from src.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class LocalBroker:
+    """
+    In-process job broker. Used when no Redis is configured and in tests.
+    """
+
+    persistent = False
+
+    def __init__(self):
+        self._queue: asyncio.Queue[int] = asyncio.Queue()
+
+    async def put(self, job_id: int) -> None:
+        await self._queue.put(job_id)
+
+    async def get(self) -> int:
+        return await self._queue.get()
+
+    async def close(self) -> None:
+        pass
+
+
+class RedisBroker:
+    """
+    Job broker backed by a Redis list, shared by every worker process.
+    """
+
+    persistent = True
+
+    def __init__(self, uri: str, key: str = "pdfchat:ingestion"):
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(uri)
+        self._key = key
+
+    async def put(self, job_id: int) -> None:
+        await self._redis.rpush(self._key, job_id)
+
+    async def get(self) -> int:
+        while True:
+            item = await self._redis.blpop(self._key, timeout=5)
+            if item is not None:
+                return int(item[1])
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+class IngestionQueue:
+    """
+    Bounded pool of background workers that parse, split, embed and upsert
+    uploaded PDFs. Job state lives in the database so that progress can be
+    reported and interrupted jobs can be retried after a restart.
+    """
+
+    def __init__(
+        self,
+        backend: str,
+        workers: int,
+        max_attempts: int,
+        retry_delay: float,
+        lease_seconds: int,
+    ):
+        self.backend = backend
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lease = timedelta(seconds=lease_seconds)
+        self._broker = None
+        self._tasks: set[asyncio.Task] = set()
+        # Jobs whose run or retry was cancelled by stop().
+        self._interrupted: set[int] = set()
+
+    def _create_broker(self):
+        if self.backend == "redis":
+            return RedisBroker(settings.redis_uri)
+        return LocalBroker()
+
+    async def start(self) -> None:
+        """
+        Start the workers and re-enqueue jobs interrupted by a previous shutdown.
+        """
+        self._broker = self._create_broker()
+        for _ in range(self.workers):
+            self._spawn(self._worker())
+        await self._recover(include_queued=not self._broker.persistent)
+        self._spawn(self._sweep())
+
+    async def stop(self) -> None:
+        """
+        Stop the workers. Jobs they were running, or waiting to retry, are
+        queued again: right away on a persistent broker, so another process
+        picks them up, and otherwise on the next start.
+        """
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        if self._interrupted:
+            async with async_session() as db:
+                for job_id in sorted(self._interrupted):
+                    await requeue_job(db, job_id)
+                    if self._broker.persistent:
+                        await self._broker.put(job_id)
+            logger.info(
+                "Requeued %d interrupted ingestion jobs", len(self._interrupted)
+            )
+            self._interrupted.clear()
+        if self._broker is not None:
+            await self._broker.close()
+            self._broker = None
+
+    async def _recover(self, include_queued: bool) -> None:
+        recovered = 0
+        async with async_session() as db:
+            jobs = await get_recoverable_jobs(db, self.lease, include_queued)
+            stale_before = datetime.utcnow() - self.lease
+            for job in jobs:
+                # A running job may have renewed its lease since it was read.
+                queued = include_queued and job.status == JobStatus.QUEUED
+                if await requeue_job(db, job.id, None if queued else stale_before):
+                    await self._broker.put(job.id)
+                    recovered += 1
+        if recovered:
+            logger.info("Recovered %d ingestion jobs", recovered)
+
+    async def _sweep(self) -> None:
+        # Jobs of a process that died without stopping are picked up once
+        # their lease expires, without waiting for a restart.
+        while True:
+            await asyncio.sleep(self.lease.total_seconds() / 2)
+            try:
+                await self._recover(include_queued=False)
+            except Exception:
+                logger.exception("Failed to recover expired ingestion jobs")
+
+    async def enqueue(self, db: AsyncSession, document_id: int) -> IngestionJob:
+        """
+        Create a job for the document and hand it to the workers.
+
+        :param db: The database session
+        :param document_id: The document to ingest
+        :return: The created job
+        """
+        job = await create_job(db, document_id)
+        await self._broker.put(job.id)
+        return job
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._broker.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Ingestion job %s crashed", job_id)
+
+    async def _heartbeat(self, job_id: int, attempt: int) -> None:
+        # Parsing a large PDF reports no progress for a long time, so the
+        # lease is renewed on a timer rather than by the progress updates.
+        while True:
+            await asyncio.sleep(self.lease.total_seconds() / 3)
+            try:
+                async with async_session() as db:
+                    if not await update_job(db, job_id, attempt=attempt):
+                        return
+            except Exception:
+                logger.exception(
+                    "Failed to renew the lease of ingestion job %s", job_id
+                )
+
+    async def _retry_later(self, job_id: int, delay: float) -> None:
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self._interrupted.add(job_id)
+            raise
+        await self._broker.put(job_id)
+
+    async def _run(self, job_id: int) -> None:
+        async with async_session() as db:
+            if not await claim_job(db, job_id):
+                return
+            job = await get_job_by_id(db, job_id)
+            attempt = job.attempts
+            document = await db.get(Document, job.document_id)
+            if document is None:
+                await update_job(
+                    db,
+                    job_id,
+                    attempt=attempt,
+                    status=JobStatus.FAILED,
+                    error="Document not found",
+                )
+                return
+
+            async def progress(stage: str, processed: int, total: Optional[int]):
+                await update_job(
+                    db,
+                    job_id,
+                    attempt=attempt,
+                    stage=stage,
+                    processed_chunks=processed,
+                    total_chunks=total,
+                )
+
+            heartbeat = asyncio.create_task(self._heartbeat(job_id, attempt))
+            try:
+                vector_count = await create_embeddings_for_pdf(
+                    document_id=document.id,
+                    document_path=document.file_path,
+                    progress=progress,
+                    file_hash=document.file_hash,
+                )
+            except asyncio.CancelledError:
+                # Stopped mid-job; stop() queues it again.
+                self._interrupted.add(job_id)
+                raise
+            except Exception as e:
+                logger.exception("Ingestion job %s failed", job_id)
+                await db.rollback()
+                if attempt < self.max_attempts:
+                    if await update_job(
+                        db,
+                        job_id,
+                        attempt=attempt,
+                        status=JobStatus.QUEUED,
+                        error=str(e),
+                    ):
+                        delay = self.retry_delay * 2 ** (attempt - 1)
+                        self._spawn(self._retry_later(job_id, delay))
+                else:
+                    await update_job(
+                        db,
+                        job_id,
+                        attempt=attempt,
+                        status=JobStatus.FAILED,
+                        error=str(e),
+                    )
+                return
+            finally:
+                heartbeat.cancel()
+
+            if not await complete_job(db, job_id, attempt, document.id, vector_count):
+                logger.warning(
+                    "Ingestion job %s was taken over by another worker, "
+                    "discarding the result of attempt %s",
+                    job_id,
+                    attempt,
+                )
+
+
+ingestion_queue = IngestionQueue(
+    backend=settings.ingestion_queue_backend,
+    workers=settings.ingestion_workers,
+    max_attempts=settings.ingestion_max_attempts,
+    retry_delay=settings.ingestion_retry_delay,
+    lease_seconds=settings.ingestion_job_lease_seconds,
+)
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.db import async_session
+from src.database.repository.chat import save_messages, save_turn, turn_rows
+from src.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class MessageWriter:
+    """
+    Batches message inserts across concurrent chat turns. Rows submitted
+    while a batch is being committed are written together in the next one,
+    so under load many turns share a single transaction; ``max_delay`` can
+    hold each batch open a little longer to grow it.
+
+    Reads of a chat's messages should call ``wait_for_chat`` first, so a
+    turn that is still queued is never missing from the history.
+    """
+
+    def __init__(self, max_batch: int, max_delay: float):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # The future of each chat's most recently queued rows; batches are
+        # committed in order, so it covers the earlier ones too.
+        self._last: dict[int, asyncio.Future] = {}
+
+    def start(self) -> None:
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        Commit everything still queued and stop the writer.
+        """
+        if self._task is None:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        self._queue = None
+
+    def submit(self, rows: list[dict]) -> asyncio.Future:
+        """
+        Queue message rows for the next batch.
+
+        :param rows: Message rows as accepted by ``save_messages``
+        :return: A future resolved once the rows are written, with True if
+            they were committed or False if writing them failed
+        """
+        # Scripts that never ran the app lifespan still get a writer.
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((rows, future))
+        for chat_id in {row["chat_id"] for row in rows}:
+            self._last[chat_id] = future
+        return future
+
+    async def wait_for_chat(self, chat_id: int) -> None:
+        future = self._last.get(chat_id)
+        if future is not None:
+            await asyncio.shield(future)
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            if self.max_delay:
+                await asyncio.sleep(self.max_delay)
+            batch = [item]
+            rows = len(item[0])
+            while rows < self.max_batch and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+                rows += len(item[0])
+            await self._flush(batch)
+
+    async def _write(self, rows: list[dict]) -> None:
+        async with async_session() as db:
+            await save_messages(db, rows)
+
+    async def _flush(self, batch: list[tuple[list[dict], asyncio.Future]]) -> None:
+        try:
+            await self._write([row for rows, _ in batch for row in rows])
+            results = [True] * len(batch)
+        except Exception:
+            if len(batch) == 1:
+                logger.exception("Failed to write %s queued messages", len(batch[0][0]))
+                results = [False]
+            else:
+                # One bad turn, e.g. of a chat deleted while it was queued,
+                # must not drop the others: retry each submission on its own.
+                logger.warning(
+                    "Failed to write a batch of %s turns, retrying one by one",
+                    len(batch),
+                    exc_info=True,
+                )
+                results = [await self._write_one(rows) for rows, _ in batch]
+        for (_, future), committed in zip(batch, results):
+            future.set_result(committed)
+        for chat_id, future in list(self._last.items()):
+            if future.done():
+                del self._last[chat_id]
+
+    async def _write_one(self, rows: list[dict]) -> bool:
+        try:
+            await self._write(rows)
+            return True
+        except Exception:
+            chat_ids = ", ".join(sorted({str(row["chat_id"]) for row in rows}))
+            logger.exception("Failed to write the messages of chat %s", chat_ids)
+            return False
+
+
+message_writer = MessageWriter(
+    settings.message_write_batch_size, settings.message_write_delay
+)
+
+
+async def persist_turn(
+    chat_id: int,
+    question: str,
+    answer: Optional[str],
+    asked_at: datetime,
+    db: Optional[AsyncSession] = None,
+) -> None:
+    """
+    Save a chat turn's question and answer in one transaction. With
+    ``settings.message_write_behind`` the turn is queued for the message
+    writer and this returns at once; otherwise the turn is committed before
+    returning, in ``db`` if given or else in the writer's session, which
+    completes even if the caller is cancelled, and a failure is raised.
+
+    :param chat_id: The chat
+    :param question: The user's message
+    :param answer: The AI answer, None to save only the question
+    :param asked_at: When the question was received
+    :param db: The request's session
+    """
+    if settings.message_write_behind:
+        message_writer.submit(turn_rows(chat_id, question, answer, asked_at))
+    elif db is not None:
+        await save_turn(db, chat_id, question, answer, asked_at)
+    else:
+        rows = turn_rows(chat_id, question, answer, asked_at)
+        if not await asyncio.shield(message_writer.submit(rows)):
+            raise RuntimeError(f"Failed to save a turn of chat {chat_id}")
@@ -0,0 +1,308 @@
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Iterable, Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+# (stage, seconds) of the current request, set by ServerTimingMiddleware.
+_request_timings: ContextVar[Optional[list[tuple[str, float]]]] = ContextVar(
+    "request_timings", default=None
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Counter:
+    """
+    A monotonically increasing count per label set.
+    """
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_format_labels(self.labels, labels)} {value}"
+
+
+class Histogram:
+    """
+    Observations per label set, counted into fixed cumulative buckets.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        # Per label set: a count per bucket plus +Inf, and the sum.
+        self._values: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    def snapshot(self, *labels: str) -> tuple[list[int], float]:
+        """
+        The count per bucket, +Inf last, and the sum of a label set.
+        """
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                return [0] * (len(self.buckets) + 1), 0.0
+            return list(entry[0]), entry[1][0]
+
+    def collect(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            values = [
+                (labels, list(counts), total[0])
+                for labels, (counts, total) in self._values.items()
+            ]
+        names = self.labels + ("le",)
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield (
+                    f"{self.name}_bucket{_format_labels(names, labels + (le,))} "
+                    f"{cumulative}"
+                )
+            suffix = _format_labels(self.labels, labels)
+            yield f"{self.name}_sum{suffix} {total}"
+            yield f"{self.name}_count{suffix} {cumulative}"
+
+
+class CallbackMetric:
+    """
+    A value read from elsewhere at scrape time, e.g. a cache's hit count.
+    """
+
+    def __init__(
+        self, name: str, documentation: str, kind: str, read: Callable[[], float]
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.read = read
+
+    def collect(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield f"{self.name} {float(self.read())}"
+
+
+class MetricsRegistry:
+    """
+    App-wide metrics, rendered in the Prometheus text format. Kept
+    dependency-free: an observation is a bisect and a dict update under a
+    lock, so instrumenting hot paths stays cheap.
+    """
+
+    def __init__(self):
+        self._metrics: dict[str, object] = {}
+
+    def _register(self, metric):
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labels=()) -> Counter:
+        return self._register(Counter(name, documentation, tuple(labels)))
+
+    def histogram(self, name: str, documentation: str, labels=()) -> Histogram:
+        return self._register(Histogram(name, documentation, tuple(labels)))
+
+    def gauge_callback(self, name: str, documentation: str, read) -> None:
+        self._register(CallbackMetric(name, documentation, "gauge", read))
+
+    def counter_callback(self, name: str, documentation: str, read) -> None:
+        self._register(CallbackMetric(name, documentation, "counter", read))
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+stage_seconds = metrics.histogram(
+    "pdfchat_stage_duration_seconds",
+    "Time spent in each stage of request handling and ingestion.",
+    labels=("stage",),
+)
+request_seconds = metrics.histogram(
+    "pdfchat_http_request_duration_seconds",
+    "Time until the response starts, per route.",
+    labels=("method", "route"),
+)
+requests_total = metrics.counter(
+    "pdfchat_http_requests_total",
+    "Requests per route and status code.",
+    labels=("method", "route", "status"),
+)
+
+
+def record_stage(name: str, seconds: float) -> None:
+    """
+    Record a stage duration in the stage histogram and, within a request, in
+    its Server-Timing header.
+    """
+    stage_seconds.observe(seconds, name)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+class stage:
+    """
+    Time a block as a named stage::
+
+        with stage("history"):
+            ...
+    """
+
+    __slots__ = ("name", "_start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        record_stage(self.name, time.perf_counter() - self._start)
+        return False
+
+
+def timed(name: str):
+    """
+    Decorator timing every call of a coroutine function as a stage.
+    """
+
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with stage(name):
+                return await fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def format_server_timing(timings: list[tuple[str, float]], total: float) -> str:
+    # Repeated stages, like the two message commits of a turn, are summed.
+    durations: dict[str, float] = {}
+    for name, seconds in timings:
+        durations[name] = durations.get(name, 0.0) + seconds
+    durations["total"] = total
+    return ", ".join(
+        f"{name};dur={seconds * 1000:.1f}" for name, seconds in durations.items()
+    )
+
+
+def _route_path(scope: Scope) -> str:
+    # The router stores the matched route in the scope; templates keep the
+    # label cardinality bounded.
+    route = scope.get("route")
+    return route.path if route is not None else "unmatched"
+
+
+class ServerTimingMiddleware:
+    """
+    Records the duration and status of every request per route template and
+    adds the stages timed so far as a ``Server-Timing`` header. For streamed
+    responses the header only covers the stages before the first byte.
+    """
+
+    def __init__(self, app: ASGIApp, header: bool = True):
+        self.app = app
+        self.header = header
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: list[tuple[str, float]] = []
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                total = time.perf_counter() - start
+                request_seconds.observe(total, scope["method"], _route_path(scope))
+                if self.header:
+                    headers = MutableHeaders(scope=message)
+                    headers.append(
+                        "Server-Timing", format_server_timing(timings, total)
+                    )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            requests_total.inc(scope["method"], _route_path(scope), str(status_code))
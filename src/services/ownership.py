@@ -0,0 +1,119 @@
+from fastapi import Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.db import async_session, engine, get_db, get_read_db, read_engine
+from src.database.models import Chat, Document
+from src.database.repository.chat import get_user_chat
+from src.database.repository.documents import get_user_document
+from src.services.auth import auth_service
+from src.services.user_cache import CurrentUser
+
+
+async def require_owned_chat(db: AsyncSession, chat_id: int, user: CurrentUser) -> Chat:
+    """
+    Returns the chat if it belongs to the user.
+
+    Args:
+        db (AsyncSession): The database session.\n
+        chat_id (int): The chat ID.\n
+        user (CurrentUser): The current user.
+
+    Raises:
+        HTTPException: If the chat does not exist or belongs to another user.
+
+    Returns:
+        Chat: The chat.
+    """
+    chat = await get_user_chat(db, chat_id, user.id)
+    if chat is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Chat not found"
+        )
+    return chat
+
+
+async def require_owned_document(
+    db: AsyncSession, document_id: int, user: CurrentUser
+) -> Document:
+    """
+    Returns the document if it belongs to the user.
+
+    Args:
+        db (AsyncSession): The database session.\n
+        document_id (int): The document ID.\n
+        user (CurrentUser): The current user.
+
+    Raises:
+        HTTPException: If the document does not exist or belongs to another user.
+
+    Returns:
+        Document: The document.
+    """
+    document = await get_user_document(db, document_id, user.id)
+    if document is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Document not found."
+        )
+    return document
+
+
+async def get_owned_chat(
+    chat_id: int,
+    db: AsyncSession = Depends(get_db),
+    user: CurrentUser = Depends(auth_service.get_current_user),
+) -> Chat:
+    """
+    Dependency resolving the ``chat_id`` path parameter to a chat owned by
+    the current user with a single query.
+    """
+    return await require_owned_chat(db, chat_id, user)
+
+
+async def get_owned_document(
+    document_id: int,
+    db: AsyncSession = Depends(get_db),
+    user: CurrentUser = Depends(auth_service.get_current_user),
+) -> Document:
+    """
+    Dependency resolving the ``document_id`` parameter to a document owned by
+    the current user with a single query.
+    """
+    return await require_owned_document(db, document_id, user)
+
+
+async def get_readable_chat(
+    chat_id: int,
+    db: AsyncSession = Depends(get_read_db),
+    user: CurrentUser = Depends(auth_service.get_current_user),
+) -> Chat:
+    """
+    Same as ``get_owned_chat``, but checked on the read session, for
+    endpoints that only read and should not take a primary connection.
+    A chat the replica does not have yet is looked up on the primary.
+    """
+    try:
+        return await require_owned_chat(db, chat_id, user)
+    except HTTPException:
+        if read_engine is engine:
+            raise
+    async with async_session() as primary:
+        return await require_owned_chat(primary, chat_id, user)
+
+
+async def get_readable_document(
+    document_id: int,
+    db: AsyncSession = Depends(get_read_db),
+    user: CurrentUser = Depends(auth_service.get_current_user),
+) -> Document:
+    """
+    Same as ``get_owned_document``, but checked on the read session, for
+    endpoints that only read and should not take a primary connection.
+    A document the replica does not have yet is looked up on the primary.
+    """
+    try:
+        return await require_owned_document(db, document_id, user)
+    except HTTPException:
+        if read_engine is engine:
+            raise
+    async with async_session() as primary:
+        return await require_owned_document(primary, document_id, user)
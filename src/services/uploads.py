@@ -0,0 +1,163 @@
+import asyncio
+import hashlib
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO
+
+from fastapi import HTTPException, UploadFile, status
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src.settings import settings
+
+PDF_MAGIC = b"%PDF-"
+# Page objects outside compressed object streams; "/Type /Pages" is the page
+# tree and must not match.
+PAGE_MARKER = re.compile(rb"/Type\s*/Page(?=[^A-Za-z])")
+# Enough trailing bytes to find a marker split across two reads.
+MARKER_OVERLAP = 64
+# Room for the multipart boundaries and part headers around the file.
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+@dataclass
+class StoredUpload:
+    path: Path
+    size: int
+    sha256: str
+    page_markers: int
+
+
+class PageMarkerCounter:
+    """
+    Counts page objects across a stream of blocks. This is a cheap
+    lower bound: pages inside compressed object streams are not visible.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._tail = b""
+
+    def update(self, block: bytes) -> None:
+        window = self._tail + block
+        self.count += len(PAGE_MARKER.findall(window)) - len(
+            PAGE_MARKER.findall(self._tail)
+        )
+        self._tail = window[-MARKER_OVERLAP:]
+
+
+def _write_block(file: BinaryIO, digest, counter: PageMarkerCounter, block: bytes):
+    # hashlib and file writes release the GIL, so one hop per block does all
+    # the work off the event loop.
+    digest.update(block)
+    counter.update(block)
+    file.write(block)
+
+
+async def store_upload(
+    upload: UploadFile,
+    path: Path,
+    max_bytes: int = settings.max_upload_bytes,
+    max_pages: int = settings.max_upload_pages,
+    chunk_size: int = settings.upload_chunk_size,
+) -> StoredUpload:
+    """
+    Stream an uploaded PDF to disk in chunks without blocking the event loop,
+    hashing it and counting its pages in the same pass. The partial file is
+    removed if the upload is rejected.
+
+    :param upload: The uploaded file
+    :param path: Where to store it
+    :param max_bytes: The maximum file size
+    :param max_pages: The maximum number of pages found by the precheck
+    :param chunk_size: The size of each read
+    :return: The stored file with its size, SHA-256 and page count estimate
+    :raises HTTPException: 413 if the file or its page count is too large,
+        400 if it is not a PDF
+    """
+    loop = asyncio.get_running_loop()
+    digest = hashlib.sha256()
+    counter = PageMarkerCounter()
+    size = 0
+    file = await loop.run_in_executor(None, path.open, "wb")
+    try:
+        while block := await upload.read(chunk_size):
+            if size == 0 and not block.startswith(PDF_MAGIC):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Only PDF files are allowed.",
+                )
+            size += len(block)
+            if size > max_bytes:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"File is larger than {max_bytes} bytes.",
+                )
+            await loop.run_in_executor(None, _write_block, file, digest, counter, block)
+            if counter.count > max_pages:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"PDF has more than {max_pages} pages.",
+                )
+        if size == 0:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Empty file."
+            )
+    except BaseException:
+        await loop.run_in_executor(None, file.close)
+        path.unlink(missing_ok=True)
+        raise
+    await loop.run_in_executor(None, file.close)
+    return StoredUpload(path, size, digest.hexdigest(), counter.count)
+
+
+class RequestSizeLimitMiddleware:
+    """
+    Rejects request bodies larger than ``max_bytes`` with 413 before they
+    are parsed: at once when ``Content-Length`` is too large, otherwise as
+    soon as the streamed body passes the limit, so an oversized upload is
+    never spooled to disk by the form parser.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_bytes: int = settings.max_upload_bytes + MULTIPART_OVERHEAD,
+    ):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.detail = f"Request body is larger than {max_bytes} bytes."
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                if value.isdigit() and int(value) > self.max_bytes:
+                    response = JSONResponse(
+                        {"detail": self.detail},
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    )
+                    await response(scope, receive, send)
+                    return
+                break
+
+        received = 0
+
+        async def receive_limited() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised inside the form parsing, so FastAPI answers 413.
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=self.detail,
+                    )
+            return message
+
+        await self.app(scope, receive_limited, send)
@@ -0,0 +1,240 @@
+import asyncio
+import hashlib
+import json
+import logging
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+
+from src.database.models import User
+from src.services.cache import LRUCache
+from src.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """
+    The authenticated user as seen by the routes: no password hash, no
+    session, safe to share between requests.
+    """
+
+    id: int
+    email: str
+
+
+def token_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+class LocalUserCache:
+    """
+    Per-process cache of verified access tokens.
+    """
+
+    def __init__(self, maxsize: int):
+        self._cache: LRUCache[CurrentUser] = LRUCache(maxsize)
+
+    @property
+    def hits(self) -> int:
+        return self._cache.hits
+
+    @property
+    def misses(self) -> int:
+        return self._cache.misses
+
+    async def get(self, key: str) -> Optional[CurrentUser]:
+        return self._cache.get(key)
+
+    async def set(self, key: str, user: CurrentUser, ttl: float) -> None:
+        self._cache.set(key, user, ttl)
+
+    async def invalidate(self, email: str) -> None:
+        self.discard(email)
+
+    def discard(self, email: str) -> None:
+        self._cache.remove_if(lambda user: user.email == email)
+
+
+class RedisUserCache:
+    """
+    Verified access tokens shared by every worker through Redis. Each email
+    keeps a set of its token keys so that all of a user's entries can be
+    dropped at once. While Redis is unreachable, lookups miss and requests
+    fall back to the database.
+    """
+
+    prefix = "pdfchat:auth:"
+
+    def __init__(self, uri: str, timeout: float):
+        import redis.asyncio as redis
+        from redis.exceptions import RedisError
+
+        self._redis = redis.from_url(
+            uri, socket_timeout=timeout, socket_connect_timeout=timeout
+        )
+        self._errors = (RedisError, OSError)
+        self._available = True
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _failed(self, action: str) -> None:
+        self.errors += 1
+        # Log once per outage rather than once per request.
+        if self._available:
+            logger.warning("Redis user cache unavailable (%s)", action, exc_info=True)
+            self._available = False
+
+    def _succeeded(self) -> None:
+        if not self._available:
+            logger.info("Redis user cache available again")
+            self._available = True
+
+    async def get(self, key: str) -> Optional[CurrentUser]:
+        try:
+            value = await self._redis.get(self.prefix + key)
+        except self._errors:
+            self._failed("get")
+            value = None
+        else:
+            self._succeeded()
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return CurrentUser(**json.loads(value))
+
+    async def set(self, key: str, user: CurrentUser, ttl: float) -> None:
+        email_key = f"{self.prefix}email:{user.email}"
+        try:
+            async with self._redis.pipeline() as pipe:
+                pipe.set(
+                    self.prefix + key, json.dumps(asdict(user)), ex=max(int(ttl), 1)
+                )
+                pipe.sadd(email_key, key)
+                pipe.expire(email_key, settings.auth_cache_ttl)
+                await pipe.execute()
+        except self._errors:
+            self._failed("set")
+        else:
+            self._succeeded()
+
+    async def invalidate(self, email: str) -> None:
+        email_key = f"{self.prefix}email:{email}"
+        try:
+            keys = await self._redis.smembers(email_key)
+            await self._redis.delete(
+                email_key, *(self.prefix + key.decode() for key in keys)
+            )
+        except self._errors:
+            # Entries left behind expire after settings.auth_cache_ttl.
+            logger.error("Failed to invalidate cached tokens of %s", email)
+            self._failed("invalidate")
+        else:
+            self._succeeded()
+
+
+class UserCache:
+    """
+    TTL cache of verified access tokens mapped to lightweight user records,
+    so that authenticated requests skip the user lookup in the database.
+    """
+
+    def __init__(self, backend: str, maxsize: int, ttl: float):
+        self.ttl = ttl
+        self._tasks: set[asyncio.Task] = set()
+        if backend == "redis":
+            self._backend = RedisUserCache(
+                settings.redis_uri, settings.auth_cache_redis_timeout
+            )
+        else:
+            self._backend = LocalUserCache(maxsize)
+
+    @property
+    def hits(self) -> int:
+        return self._backend.hits
+
+    @property
+    def misses(self) -> int:
+        return self._backend.misses
+
+    @property
+    def errors(self) -> int:
+        return getattr(self._backend, "errors", 0)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    async def get(self, token: str) -> Optional[CurrentUser]:
+        if self.ttl <= 0:
+            return None
+        return await self._backend.get(token_key(token))
+
+    async def set(self, token: str, user: CurrentUser, expires_in: float) -> None:
+        """
+        Cache a verified token, never beyond the token's own expiry.
+        """
+        ttl = min(self.ttl, expires_in)
+        if ttl > 0:
+            await self._backend.set(token_key(token), user, ttl)
+
+    async def invalidate(self, email: str) -> None:
+        await self._backend.invalidate(email)
+
+    def invalidate_nowait(self, email: str) -> None:
+        """
+        Invalidate from synchronous code such as ORM event hooks.
+        """
+        if isinstance(self._backend, LocalUserCache):
+            self._backend.discard(email)
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            logger.warning("No event loop, cached tokens of %s not invalidated", email)
+            return
+        task = loop.create_task(self.invalidate(email))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+user_cache = UserCache(
+    backend=settings.auth_cache_backend,
+    maxsize=settings.auth_cache_size,
+    ttl=settings.auth_cache_ttl,
+)
+
+
+# Emails whose entries are dropped again once the session commits.
+_PENDING_KEY = "user_cache_invalidations"
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_changed_user(mapper, connection, target: User) -> None:
+    # Drop entries under both the old and the new email.
+    emails = {target.email, *inspect(target).attrs.email.history.deleted}
+    emails.discard(None)
+    for email in emails:
+        user_cache.invalidate_nowait(email)
+    # A request may cache the old row between this flush and the commit.
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_PENDING_KEY, set()).update(emails)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session: Session) -> None:
+    for email in session.info.pop(_PENDING_KEY, ()):
+        user_cache.invalidate_nowait(email)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_users(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings
 from pydantic import ConfigDict
@@ -8,18 +10,101 @@ load_dotenv()
 
 class Settings(BaseSettings):
     sqlalchemy_database_uri: str
+    sqlalchemy_read_database_uri: Optional[str] = None
+    db_pool_size: int = 10
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = False
 
     openai_api_key: str
 
     redis_uri: str
 
-    pinecone_api_key: str
-    pinecone_index_name: str
-    pinecone_env_name: str
+    vector_store_backend: str = "pinecone"
+    local_vector_store_path: str = "storage/vectors"
+
+    pinecone_api_key: Optional[str] = None
+    pinecone_index_name: Optional[str] = None
+    pinecone_env_name: Optional[str] = None
+    vector_delete_concurrency: int = 8
 
     jwt_secret_key: str
     jwt_algorithm: str
 
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 2
+    password_hash_queue_size: int = 32
+
+    auth_cache_backend: str = "local"
+    auth_cache_size: int = 10_000
+    auth_cache_ttl: int = 300
+    auth_cache_redis_timeout: float = 0.5
+
+    retrieval_mode: str = "vector"
+    retrieval_k: int = 4
+    lexical_index_path: str = "storage/lexical"
+    lexical_min_coverage: float = 0.9
+    lexical_min_margin: float = 1.5
+
+    embedding_cache_enabled: bool = True
+    embedding_cache_path: str = "storage/embedding_cache.sqlite3"
+    embedding_cache_max_entries: int = 500_000
+    file_chunk_cache_max_entries: int = 1_000
+    file_chunk_cache_max_chars: int = 16_000_000
+
+    embedding_batch_size: int = 100
+    embedding_concurrency: int = 4
+    upsert_concurrency: int = 4
+    embedding_requests_per_minute: int = 3_000
+    embedding_tokens_per_minute: int = 1_000_000
+    embedding_max_retries: int = 6
+
+    max_upload_bytes: int = 50 * 1024 * 1024
+    max_upload_pages: int = 2_000
+    upload_chunk_size: int = 1024 * 1024
+
+    parsing_pool_size: int = 2
+    parsing_pages_per_task: int = 50
+
+    chain_cache_size: int = 256
+    speculative_retrieval: bool = False
+    speculative_rewrite_threshold: float = 0.8
+
+    answer_cache_enabled: bool = True
+    answer_cache_threshold: float = 0.95
+    answer_cache_ttl: int = 86_400
+    answer_cache_documents: int = 1_000
+    answer_cache_per_document: int = 128
+
+    history_token_budget: int = 2_000
+    history_max_messages: int = 100
+    history_summary_min_tokens: int = 200
+    history_summary_max_tokens: int = 300
+
+    message_write_behind: bool = False
+    message_write_batch_size: int = 500
+    message_write_delay: float = 0.0
+
+    ws_max_message_chars: int = 8_000
+    ws_max_frame_bytes: int = 64 * 1024
+    ws_idle_timeout: float = 600.0
+    ws_chat_recheck_interval: float = 30.0
+
+    metrics_enabled: bool = True
+    metrics_endpoint_enabled: bool = False
+    metrics_token: Optional[str] = None
+    server_timing_enabled: bool = True
+
+    page_size: int = 50
+    max_page_size: int = 200
+
+    ingestion_queue_backend: str = "local"
+    ingestion_workers: int = 2
+    ingestion_max_attempts: int = 3
+    ingestion_retry_delay: float = 5.0
+    ingestion_job_lease_seconds: int = 600
+
     model_config = ConfigDict(env_file=".env", env_file_encoding="utf-8", extra="allow")
 
 
@@ -0,0 +1,14 @@
+"""
+Run the tests offline: importing ``benchmarks.environment`` first points the
+settings at throwaway local storage and the local vector store, whatever
+the shell or .env says, so importing the app needs no credentials and
+writes nothing into the working directory.
+"""
+
+import shutil
+
+from benchmarks.environment import WORK_DIR
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(WORK_DIR, ignore_errors=True)
@@ -0,0 +1,31 @@
+import asyncio
+
+import pytest
+
+from benchmarks.pdfs import generate_pdf
+from src.chat.parsing_pool import ParsingPool, iter_document_chunks
+
+
+async def _pooled_chunks(pool: ParsingPool, path: str) -> list[tuple[int, str]]:
+    return [
+        chunk async for page_chunks in pool.stream_chunks(path) for chunk in page_chunks
+    ]
+
+
+@pytest.mark.parametrize("pages_per_task", [1, 3, 7])
+def test_pooled_chunks_match_single_process(tmp_path, pages_per_task):
+    path = str(generate_pdf(tmp_path / "document.pdf", pages=10))
+    expected = [
+        chunk
+        for page_chunks in iter_document_chunks(path, pages_per_task)
+        for chunk in page_chunks
+    ]
+
+    pool = ParsingPool(size=2, pages_per_task=pages_per_task)
+    try:
+        pooled = asyncio.run(_pooled_chunks(pool, path))
+    finally:
+        pool.stop()
+
+    assert pooled == expected
+    assert {page for page, _ in pooled} == set(range(10))
@@ -0,0 +1,119 @@
+"""
+Check that the hot repository queries are served by indexes: every query in
+``benchmarks.queries.QUERIES`` runs against a seeded database while its SQL
+is captured, and EXPLAIN must not show a full table scan.
+
+Runs against an in-memory SQLite database, or against the empty database
+given in ``QUERY_PLAN_DATABASE_URL``, e.g. a throwaway PostgreSQL database;
+there sequential scans are disabled so the plan shows whether a usable index
+exists at all. The schema is created and dropped, so a database that already
+has tables is refused.
+"""
+
+import asyncio
+import json
+import os
+
+import pytest
+from sqlalchemy import event, inspect, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from benchmarks.queries import QUERIES, seed
+from src.database.db import Base
+
+DATABASE_URL = os.environ.get("QUERY_PLAN_DATABASE_URL", "sqlite+aiosqlite://")
+
+
+def sqlite_full_scans(rows) -> list[str]:
+    # EXPLAIN QUERY PLAN rows are (id, parent, notused, detail); a "SCAN"
+    # detail reads a whole table or index, a "SEARCH" uses a key lookup.
+    return [row[3] for row in rows if row[3].startswith("SCAN ")]
+
+
+def postgres_full_scans(rows) -> list[str]:
+    scans = []
+
+    def walk(node):
+        if node["Node Type"] in ("Seq Scan", "Index Only Scan", "Index Scan"):
+            if node["Node Type"] == "Seq Scan" or "Index Cond" not in node:
+                scans.append(f"{node['Node Type']} on {node['Relation Name']}")
+        for child in node.get("Plans", []):
+            walk(child)
+
+    plan = rows[0][0]
+    walk((json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"])
+    return scans
+
+
+async def collect_full_scans(url: str) -> dict[str, list[str]]:
+    """
+    Run every query in QUERIES and collect the full scans in their plans.
+
+    :param url: The URL of an empty database
+    :return: The full scans of each query, keyed by query name
+    """
+    is_sqlite = url.startswith("sqlite")
+    engine_kwargs = {"poolclass": StaticPool} if is_sqlite else {}
+    engine = create_async_engine(url, **engine_kwargs)
+    session = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+    captured: list[tuple[str, object]] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    try:
+        async with engine.begin() as conn:
+            tables = await conn.run_sync(lambda c: inspect(c).get_table_names())
+            if tables:
+                raise RuntimeError(
+                    f"Refusing to check query plans in a database with tables: "
+                    f"{', '.join(sorted(tables))}"
+                )
+            await conn.run_sync(Base.metadata.create_all)
+        try:
+            async with session() as db:
+                await seed(db)
+
+            event.listen(engine.sync_engine, "before_cursor_execute", capture)
+            results = {}
+            for name, query in QUERIES.items():
+                captured.clear()
+                async with session() as db:
+                    await query(db)
+                statements = list(captured)
+                scans = []
+                async with engine.connect() as conn:
+                    if is_sqlite:
+                        prefix = "EXPLAIN QUERY PLAN "
+                    else:
+                        prefix = "EXPLAIN (FORMAT JSON) "
+                        await conn.execute(text("SET enable_seqscan = off"))
+                    for statement, parameters in statements:
+                        raw = await conn.exec_driver_sql(prefix + statement, parameters)
+                        rows = raw.fetchall()
+                        if is_sqlite:
+                            scans += sqlite_full_scans(rows)
+                        else:
+                            scans += postgres_full_scans(rows)
+                results[name] = scans
+            event.remove(engine.sync_engine, "before_cursor_execute", capture)
+        finally:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.drop_all)
+    finally:
+        await engine.dispose()
+    return results
+
+
+@pytest.fixture(scope="module")
+def full_scans() -> dict[str, list[str]]:
+    return asyncio.run(collect_full_scans(DATABASE_URL))
+
+
+@pytest.mark.parametrize("name", list(QUERIES))
+def test_query_uses_indexes(full_scans, name):
+    assert full_scans[name] == []